@@ -1,11 +1,142 @@
 import random
+import numpy as np
+
+
+class Fleet:
+    # Struct-of-arrays fleet: capacity, max_distance, load and distance of every agent are
+    # NumPy arrays, so checks over the whole fleet are single array operations. Indexing
+    # and iterating give DeliveryAgent views, so code written against a list of agents
+    # keeps working. An unset max distance is NaN (None through the views).
+    def __init__(self, capacities, max_distances=None, da_ids=None):
+        num_agents = len(capacities)
+        self.da_ids = list(da_ids) if da_ids is not None else [f"DA_{i + 1}" for i in range(num_agents)]
+        self.capacity = np.array(capacities, dtype=np.int64)
+        self.max_distance = np.full(num_agents, np.nan)
+        if max_distances is not None:
+            self.set_max_distances(max_distances)
+        self.load = np.zeros(num_agents, dtype=np.int64)
+        self.distance = np.zeros(num_agents)
+        self.routes = [[] for _ in range(num_agents)]
+
+    def __len__(self):
+        return len(self.capacity)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [DeliveryAgent.view(self, i) for i in range(len(self))[index]]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("agent index out of range")
+        return DeliveryAgent.view(self, index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield DeliveryAgent.view(self, i)
+
+    def set_max_distances(self, max_distances):
+        self.max_distance[:] = [np.nan if d is None else d for d in max_distances]
+
+    def reset(self):
+        self.load[:] = 0
+        self.distance[:] = 0
+        self.routes = [[] for _ in range(len(self))]
+
+    def remaining_capacity(self):
+        return self.capacity - self.load
+
+    def feasibility(self, distance_matrix, current, candidates, agents=None):
+        # Boolean (agents x candidates) matrix of which agents can drive from their current
+        # matrix node to each candidate parcel and on back to the depot within their max
+        # distance, with room left. ``current`` holds the matrix node of every agent in
+        # ``agents`` (default: the whole fleet). Also returns the distances to the candidates.
+        agents = np.arange(len(self)) if agents is None else np.asarray(agents)
+        candidates = np.asarray(candidates)
+        distance_to_next = np.take(np.asarray(distance_matrix[np.asarray(current)]), candidates + 1, axis=1)
+        depot_distances = np.asarray(distance_matrix[candidates + 1, 0])
+        # Summed in the engines' order: distance so far, the leg, then the way back
+        total_distance = np.add(self.distance[agents, None], distance_to_next)
+        total_distance += depot_distances
+        feasible = total_distance <= self.max_distance[agents, None]
+        feasible[self.load[agents] >= self.capacity[agents]] = False
+        return feasible, distance_to_next
+
+    def score(self, distance_matrix, current, candidates, demand, agents=None):
+        # Greedy scores of every agent for every candidate, as the engines score a single
+        # agent: parcels it can take, minus a thousandth of the leg, -inf where infeasible.
+        # Returns the scores and the distances to the candidates.
+        agents = np.arange(len(self)) if agents is None else np.asarray(agents)
+        feasible, distance_to_next = self.feasibility(distance_matrix, current, candidates, agents)
+        scores = (distance_to_next / -1000).astype(np.float64, copy=False)
+        scores += np.minimum(self.remaining_capacity()[agents, None], np.asarray(demand)[candidates])
+        np.copyto(scores, -np.inf, where=~feasible)
+        return scores, distance_to_next
+
+
 class DeliveryAgent:
+    # One agent of a Fleet; its attributes read and write the fleet's arrays. Created on
+    # its own it gets a fleet of one.
+    __slots__ = ("fleet", "index")
+
     def __init__(self, da_id, capacity, max_distance):
-        self.da_id = da_id
-        self.capacity = capacity
-        self.max_distance = max_distance
-        self.load = 0 #Load is 0 before a load is assigned (placeholder)
-        self.route = []
+        self.fleet = Fleet([capacity], [max_distance], [da_id])
+        self.index = 0
+
+    @classmethod
+    def view(cls, fleet, index):
+        agent = cls.__new__(cls)
+        agent.fleet = fleet
+        agent.index = index
+        return agent
+
+    @property
+    def da_id(self):
+        return self.fleet.da_ids[self.index]
+
+    @da_id.setter
+    def da_id(self, value):
+        self.fleet.da_ids[self.index] = value
+
+    @property
+    def capacity(self):
+        return int(self.fleet.capacity[self.index])
+
+    @capacity.setter
+    def capacity(self, value):
+        self.fleet.capacity[self.index] = value
+
+    @property
+    def max_distance(self):
+        value = float(self.fleet.max_distance[self.index])
+        return None if np.isnan(value) else value
+
+    @max_distance.setter
+    def max_distance(self, value):
+        self.fleet.max_distance[self.index] = np.nan if value is None else value
+
+    @property
+    def load(self):
+        return int(self.fleet.load[self.index])
+
+    @load.setter
+    def load(self, value):
+        self.fleet.load[self.index] = value
+
+    @property
+    def distance(self):
+        return float(self.fleet.distance[self.index])
+
+    @distance.setter
+    def distance(self, value):
+        self.fleet.distance[self.index] = value
+
+    @property
+    def route(self):
+        return self.fleet.routes[self.index]
+
+    @route.setter
+    def route(self, value):
+        self.fleet.routes[self.index] = value
 
     def get_capacity(self):
         return [random.randint(20, 50)]
@@ -36,11 +167,6 @@ class DeliveryAgent:
             'Current Load': self.load
         }
 
-# DA factory to make DAs as required
+# DA factory to make DAs as required; the Fleet indexes and iterates like a list of DAs
 def create_delivery_agents(num_agents, capacity_per_agent, max_distance):
-    agents = []
-    for i in range(num_agents):
-        da_id = f"DA_{i + 1}"
-        da = DeliveryAgent(da_id=da_id, capacity=capacity_per_agent, max_distance=max_distance)
-        agents.append(da)
-    return agents
\ No newline at end of file
+    return Fleet([capacity_per_agent] * num_agents, [max_distance] * num_agents)
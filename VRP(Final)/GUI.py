@@ -2,13 +2,16 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import numpy as np
 from typing import List
-from MRA import MasterRoutingAgent, load_parcels_from_file
+from MRA import MasterRoutingAgent
 from CartesianPlane import generate_random_points
-from parcels import Package
+from parcels import Package, ParcelTable
 import threading
+import queue
 import random
 from DA import DeliveryAgent
+from render import LABEL_LIMIT, add_route_artists
 
 class CVRPGUI:
     def __init__(self, master):
@@ -23,10 +26,17 @@ class CVRPGUI:
         self.num_points = 5
         self.capacity_per_agent = 10
         self.parcels = None
+        self.parcel_table = None
         self.routes = None
         self.parcels_delivered = None
         self.is_generating_routes = False
         self.route_generation_job = None
+        self.progress_queue = None  # SolveProgress reports (or an error message) from the solver thread
+        self.cancel_event = None
+        self.coords = None  # Depot then customers, as one array for plotting
+        self.route_artists = []
+        self.label_artists = []
+        self.plotted_agents = None
 
         self.create_widgets()
 
@@ -68,11 +78,17 @@ class CVRPGUI:
         self.route_btn = ttk.Button(self.left_panel, text="Generate Route", command=self.generate_route)
         self.route_btn.grid(row=1, column=1, padx=5, pady=5)
 
+        self.cancel_btn = ttk.Button(self.left_panel, text="Cancel", command=self.cancel_route, state=tk.DISABLED)
+        self.cancel_btn.grid(row=1, column=2, padx=5, pady=5)
+
         # Creating canvas with increased size
         self.fig, self.ax = plt.subplots(figsize=(8, 6), dpi=100)
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.left_panel)
         self.canvas_widget = self.canvas.get_tk_widget()
-        self.canvas_widget.grid(row=2, column=0, columnspan=2, padx=5, pady=5)
+        self.canvas_widget.grid(row=2, column=0, columnspan=3, padx=5, pady=5)
+        # Route artists are animated: full redraws skip them and draw_routes blits them on top
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
 
         # Creating a place to indicate path costs and routing details
         self.right_panel = ttk.Frame(self.frame)
@@ -89,7 +105,7 @@ class CVRPGUI:
 
         # New label for parcel count
         self.parcel_count_label = ttk.Label(self.left_panel, text="")
-        self.parcel_count_label.grid(row=3, column=0, columnspan=2, padx=5, pady=5)
+        self.parcel_count_label.grid(row=3, column=0, columnspan=3, padx=5, pady=5)
 
     def generate_locations(self):
         try:
@@ -99,21 +115,9 @@ class CVRPGUI:
             messagebox.showerror("Invalid Input", "Please enter valid numbers for points and DAs.")
             return
 
-        self.ax.clear()
         self.points = generate_random_points(self.num_points, 0, 100, 0, 100)
         self.depot = generate_random_points(1, 0, 100, 0, 100)[0]
-
-        x, y = zip(*self.points)
-        self.ax.scatter(x, y, color='blue', label='Customers')
-        self.ax.scatter(self.depot[0], self.depot[1], color='red', label='Depot')
-
-        # Label customer locations
-        for i, (x, y) in enumerate(self.points):
-            self.ax.annotate(f'C{i+1}', (x, y), xytext=(5, 5), textcoords='offset points')
-
-        self.ax.set_xlim(0, 100)
-        self.ax.set_ylim(0, 100)
-        self.ax.legend()
+        self.draw_static_layer()
         self.ax.set_title("Customer and Depot Locations")
         self.canvas.draw()
 
@@ -124,6 +128,8 @@ class CVRPGUI:
     def generate_parcels_file(self):
         self.parcels = Package.create_parcels(self.num_points, self.points)
         Package.save_packages(self.parcels, "parcel_info.txt")
+        # Solving leaves the table untouched, so every route generation reuses it
+        self.parcel_table = ParcelTable.from_packages(self.parcels)
         self.update_parcel_count()
 
     def update_parcel_count(self):
@@ -151,48 +157,86 @@ class CVRPGUI:
             self.status_label.config(text="Route generation already in progress.")
             return
 
+        # Ask for the distances here: message boxes must not be opened from the solver thread
+        max_distances = self.generate_random_vehicle_distances()
+        if not max_distances:
+            self.status_label.config(text="Failed to generate valid max distances.")
+            return
+
         self.status_label.config(text="Generating routes...")
         self.master.update()
 
+        # The solver thread only talks to the GUI through this queue, and is stopped
+        # through the event; everything else is touched by the Tk thread alone
         self.is_generating_routes = True
-        threading.Thread(target=self.generate_route_thread, daemon=True).start()
+        self.progress_queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.cancel_btn.config(state=tk.NORMAL)
+        threading.Thread(target=self.generate_route_thread,
+                         args=(max_distances, self.progress_queue, self.cancel_event), daemon=True).start()
         self.route_generation_job = self.master.after(100, self.check_route_progress)
 
-    def generate_route_thread(self):
+    def generate_route_thread(self, max_distances, progress_queue, cancel_event):
         try:
-            self.mra = MasterRoutingAgent(self.depot, self.num_agents, self.capacity_per_agent)
-            parcels = load_parcels_from_file('parcel_info.txt')
-            self.mra.set_parcels(parcels)
-            max_distances = self.generate_random_vehicle_distances()
-            if not max_distances:
-                raise ValueError("Failed to generate valid max distances.")
-            self.mra.set_max_distances(max_distances)
+            mra = MasterRoutingAgent(self.depot, self.num_agents, self.capacity_per_agent)
+            mra.set_parcels(self.parcel_table)
+            mra.set_max_distances(max_distances)
             print("Generated Max Distances for Vehicles:", max_distances)
-            self.routes, self.parcels_delivered = self.mra.optimize_deliveries()
+            progress_queue.put(mra)  # Ahead of every report; the Tk thread takes it over
+            mra.optimize_deliveries(progress=progress_queue.put, cancel=cancel_event)
         except ValueError as e:
-            self.error_message = str(e)
-            self.routes = None
+            progress_queue.put(str(e))
         except Exception as e:
-            self.error_message = f"Error generating routes: {str(e)}"
-            self.routes = None
-        finally:
-            self.is_generating_routes = False
+            progress_queue.put(f"Error generating routes: {str(e)}")
+
+    def cancel_route(self):
+        if self.is_generating_routes and self.cancel_event is not None:
+            self.cancel_event.set()
+            self.status_label.config(text="Cancelling route generation...")
 
     def check_route_progress(self):
-        if self.is_generating_routes:
-            self.route_generation_job = self.master.after(100, self.check_route_progress)
-        else:
-            self.update_gui_with_routes()
+        # Drain the queue, draw only the newest partial routes and finish on the final report
+        latest = None
+        while True:
+            try:
+                report = self.progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(report, MasterRoutingAgent):
+                self.mra = report
+                continue
+            if isinstance(report, str) or report.done:
+                self.is_generating_routes = False
+                self.cancel_btn.config(state=tk.DISABLED)
+                self.update_gui_with_routes(report)
+                return
+            latest = report
+
+        if latest is not None:
+            self.plot_routes(latest.routes)
+            if not self.cancel_event.is_set():
+                self.status_label.config(text=f"Generating routes... round {latest.iteration} of at most "
+                                              f"{latest.max_iterations}, {latest.customers_left} customers left")
+        self.route_generation_job = self.master.after(100, self.check_route_progress)
 
-    def update_gui_with_routes(self):
+    def update_gui_with_routes(self, report):
         if self.route_generation_job:
             self.master.after_cancel(self.route_generation_job)
             self.route_generation_job = None
-        
+
+        if isinstance(report, str):
+            self.routes = None
+            self.error_message = report
+        else:
+            self.routes, self.parcels_delivered = report.routes, report.parcels_delivered
+
         if self.routes:
             self.plot_routes(self.routes)
             self.update_path_costs()
-            self.status_label.config(text="Route generation complete.")
+            if report.cancelled:
+                self.status_label.config(text="Route generation cancelled, showing the routes built so far.")
+            else:
+                self.status_label.config(text="Route generation complete.")
         else:
             error_msg = getattr(self, 'error_message', "Route generation failed.")
             self.status_label.config(text=error_msg)
@@ -200,51 +244,71 @@ class CVRPGUI:
             if "Unable to find a feasible solution" in error_msg:
                 self.status_label.config(text="Vehicles cannot make the distance. Try increasing max distance or number of DAs.")
 
-    def plot_routes(self, routes: List[List[int]]):
+    def draw_static_layer(self):
+        # Customers and depot, drawn once per set of locations and reused by every route plot
         self.ax.clear()
-
-        # Plot the points on the cartesian plane
-        x, y = zip(*self.points)
-        self.ax.scatter(x, y, color='blue', label='Customers')
+        self.route_artists = []
+        self.label_artists = []
+        self.plotted_agents = None
+        self.coords = np.array([self.depot] + list(self.points), dtype=float)
+        self.ax.scatter(self.coords[1:, 0], self.coords[1:, 1], color='blue', label='Customers')
         self.ax.scatter(self.depot[0], self.depot[1], color='red', label='Depot', s=100)
+        self.ax.set_xlim(0, 100)
+        self.ax.set_ylim(0, 100)
+        self.ax.legend(loc='upper right')
+        self.update_labels()
+        # clear() drops axes callbacks, so reconnect the label culling each time
+        self.ax.callbacks.connect('xlim_changed', self.update_labels)
+        self.ax.callbacks.connect('ylim_changed', self.update_labels)
+
+    def update_labels(self, ax=None):
+        # Label only the customers in view, and only when there are few enough to read
+        for label in self.label_artists:
+            label.remove()
+        self.label_artists = []
+        (x0, x1), (y0, y1) = sorted(self.ax.get_xlim()), sorted(self.ax.get_ylim())
+        customers = self.coords[1:]
+        visible = np.flatnonzero((customers[:, 0] >= x0) & (customers[:, 0] <= x1)
+                                 & (customers[:, 1] >= y0) & (customers[:, 1] <= y1))
+        if len(visible) > LABEL_LIMIT:
+            return
+        for i in visible:
+            self.label_artists.append(self.ax.annotate(f'C{i+1}', customers[i], xytext=(5, 5),
+                                                       textcoords='offset points'))
 
-        # Label customer locations
-        for i, (x, y) in enumerate(self.points):
-            self.ax.annotate(f'C{i+1}', (x, y), xytext=(5, 5), textcoords='offset points')
-
-        # Show routes once generated
-        colors = ['g', 'm', 'c', 'y', 'k']
-        for i, route in enumerate(routes):
-            color = colors[i % len(colors)]
-            route_points = [self.depot]
-            for stop in route:
-                if stop == -1:
-                    route_points.append(self.depot)
-                else:
-                    route_points.append(self.points[stop])
-            
-            # Plot the route
-            for j in range(len(route_points) - 1):
-                x_values = [route_points[j][0], route_points[j+1][0]]
-                y_values = [route_points[j][1], route_points[j+1][1]]
-                if route_points[j+1] == self.depot:
-                    # Use dashed line for return trips to depot
-                    self.ax.plot(x_values, y_values, color=color, linestyle='--', label=f'Route {i+1}' if j == 0 else "")
-                else:
-                    self.ax.plot(x_values, y_values, color=color, label=f'Route {i+1}' if j == 0 else "")
+    def on_draw(self, event):
+        # After a full redraw keep the static layers as the blit background and put the
+        # (animated) routes back on top
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self.route_artists:
+            self.ax.draw_artist(artist)
 
-                # Add arrows
-                mid_x = (x_values[0] + x_values[1]) / 2
-                mid_y = (y_values[0] + y_values[1]) / 2
-                dx = x_values[1] - x_values[0]
-                dy = y_values[1] - y_values[0]
-                self.ax.arrow(mid_x, mid_y, dx/10, dy/10, shape='full', lw=0, length_includes_head=True, head_width=2, color=color)
+    def plot_routes(self, routes: List[List[int]]):
+        # Route artists come from render.add_route_artists (dashed legs return to the depot,
+        # one quiver for all direction arrows). Only the routes are redrawn, blitted over the
+        # cached static layers, so the cost does not grow with per-segment artists.
+        if self.coords is None or len(self.coords) != len(self.points) + 1:
+            self.draw_static_layer()
+        for artist in self.route_artists:
+            artist.remove()
+        self.route_artists = []
+
+        self.route_artists = add_route_artists(self.ax, self.coords, routes, animated=True)
+
+        if self.plotted_agents != len(routes) or self.background is None:
+            # Legend and title change: one full redraw, which also refreshes the background
+            self.plotted_agents = len(routes)
+            self.ax.legend(loc='upper right')  # "best" would search every plotted point
+            self.ax.set_title("CVRP Routes")
+            self.canvas.draw()
+        else:
+            self.draw_routes()
 
-        self.ax.set_xlim(0, 100)
-        self.ax.set_ylim(0, 100)
-        self.ax.legend()
-        self.ax.set_title("CVRP Routes")
-        self.canvas.draw()
+    def draw_routes(self):
+        self.canvas.restore_region(self.background)
+        for artist in self.route_artists:
+            self.ax.draw_artist(artist)
+        self.canvas.blit(self.fig.bbox)
 
     def update_path_costs(self):
         detailed_costs = self.mra.calculate_detailed_route_costs(self.routes, self.parcels_delivered)
@@ -259,7 +323,8 @@ class CVRPGUI:
                     self.cost_text.insert(tk.END, f"  Total Distance: {total_distance:.2f}\n")
                     self.cost_text.insert(tk.END, f"  Total Parcels Delivered: {num_parcels}\n")
                     self.cost_text.insert(tk.END, f"  Max Distance: {self.mra.delivery_agents[i].max_distance:.2f}\n")
-                    if total_distance > self.mra.delivery_agents[i].max_distance:
+                    # Small tolerance: the totals are summed in a different order than the solver's
+                    if total_distance > self.mra.delivery_agents[i].max_distance + 1e-6:
                         self.cost_text.insert(tk.END, "  WARNING: Max distance exceeded!\n", "warning")
                 else:
                     self.cost_text.insert(tk.END, f"  {destination} (Parcels: {num_parcels}): {cost:.2f}\n")
@@ -1,7 +1,22 @@
+import time
+from contextlib import nullcontext
 import numpy as np
 from typing import List, Tuple
 from DA import DeliveryAgent, create_delivery_agents
-from parcels import Package
+from parcels import Package, ParcelTable
+from engines import greedy_fleet, greedy_granular, greedy_vectorized
+from savings import savings_solve
+from distances import MappedDistanceMatrix, build_distance_matrix, point_distances
+from distance_cache import default_cache
+from local_search import improve_routes
+from route_format import CompactRoutes
+from simulator import simulate
+from multistart import multistart_solve
+from decomposition import decomposed_solve
+from session import RoutingSession
+from sweep import sweep_fleet
+from instrumentation import SolveStats
+from progress import ProgressReporter
 
 def load_parcels_from_file(filename):
     parcels = []
@@ -27,63 +42,234 @@ def load_parcels_from_file(filename):
     
     return parcels
 
+ENGINES = ("greedy", "vectorized", "fleet", "granular", "savings")
+
 class MasterRoutingAgent:
-    def __init__(self, depot_location: Tuple[float, float], num_agents: int, capacity_per_agent: int):
+    def __init__(self, depot_location: Tuple[float, float], num_agents: int, capacity_per_agent: int,
+                 distance_storage: str = "float64", metric: str = "euclidean", auto_adjust_capacity: bool = True):
         self.depot_location = depot_location
         self.num_agents = num_agents
         self.capacity_per_agent = capacity_per_agent
-        self.delivery_agents = None
+        # Shrink capacity_per_agent when the fleet could carry every parcel (see _adjust_capacity)
+        self.auto_adjust_capacity = auto_adjust_capacity
+        self.distance_storage = distance_storage  # "float64", "float32", "condensed" or "lazy"
+        self.metric = metric  # "euclidean", "manhattan" or "haversine" (x = longitude, y = latitude)
+        self.distance_file = None
+        self.distance_nodes = None
+        self.fleet = None  # Fleet of the delivery agents, set up once parcels are loaded
         self.parcels = []
         self.distance_matrix = None
         self.max_distances = None
+        self.phase_seconds = {}  # Wall time of the latest load, precompute and cost calc
+        # Matrices are reused across agents with the same depot and customers; None disables it
+        self.distance_cache = default_cache()
+
+    def load_parcels(self, filename, use_cache: bool = True):
+        start = time.perf_counter()
+        parcels = ParcelTable.from_file(filename, use_cache)
+        self.phase_seconds["load"] = time.perf_counter() - start
+        self.set_parcels(parcels)
 
-    def set_parcels(self, parcels: List[Package]):
-        self.parcels = parcels
+    def set_parcels(self, parcels):
+        # Accepts a ParcelTable or a list of Package objects. Solving never changes the
+        # parcel demand, so the same parcels can be solved again without reloading.
+        self.parcels = parcels if isinstance(parcels, ParcelTable) else ParcelTable.from_packages(parcels)
+        start = time.perf_counter()
         self._precompute_distances()
+        self.phase_seconds["precompute"] = time.perf_counter() - start
         self._adjust_capacity()
 
     def _adjust_capacity(self):
-        total_parcels = sum(parcel.num_parcels for parcel in self.parcels)
+        total_parcels = int(self.parcels.num_parcels.sum())
         total_capacity = self.num_agents * self.capacity_per_agent
         
         # Ensure total capacity is less than total parcels
-        if total_capacity >= total_parcels:
+        if self.auto_adjust_capacity and total_capacity >= total_parcels:
             reduction_factor = 0.7  # Reduce capacity by 30%
             new_capacity = int((total_parcels * reduction_factor) / self.num_agents)
             self.capacity_per_agent = max(1, new_capacity)  # Ensure minimum capacity of 1
         
-        self.delivery_agents = create_delivery_agents(self.num_agents, self.capacity_per_agent, None)
+        self.fleet = create_delivery_agents(self.num_agents, self.capacity_per_agent, None)
+
+    @property
+    def delivery_agents(self):
+        # DeliveryAgent views of the fleet, indexable and iterable like a list
+        return self.fleet
 
     def set_max_distances(self, max_distances: List[float]):
-        if len(max_distances) != len(self.delivery_agents):
+        if len(max_distances) != len(self.fleet):
             raise ValueError("Number of max distances must match number of delivery agents")
         self.max_distances = max_distances
-        for agent, max_distance in zip(self.delivery_agents, max_distances):
-            agent.max_distance = max_distance
+        self.fleet.set_max_distances(max_distances)
+
+    def use_distance_file(self, path, nodes=None):
+        # Take distances from a precomputed matrix (e.g. road travel times) in an .npy file
+        # instead of the coordinates. nodes gives the file row of the depot and of every
+        # parcel, in that order; without it row i is matrix node i. The file is
+        # memory-mapped, never loaded whole. path=None goes back to the coordinates.
+        self.distance_file = path
+        self.distance_nodes = nodes
+        if len(self.parcels):
+            self._precompute_distances()
 
     def _precompute_distances(self):
-        locations = [self.depot_location] + [p.destination for p in self.parcels]
-        self.distance_matrix = np.array([[self.calculate_distance(p1, p2) for p2 in locations] for p1 in locations])
+        if self.distance_file is not None:
+            self.distance_matrix = MappedDistanceMatrix(self.distance_file, self.distance_nodes)
+            if len(self.distance_matrix) != len(self.parcels) + 1:
+                raise ValueError(f"The distance file covers {len(self.distance_matrix)} nodes, "
+                                 f"but the depot and parcels need {len(self.parcels) + 1}.")
+            return
+        locations = np.vstack(([self.depot_location], self.parcels.destinations))
+        if self.distance_cache is None or self.distance_storage == "lazy":
+            self.distance_matrix = build_distance_matrix(locations, self.distance_storage, self.metric)
+        else:
+            self.distance_matrix = self.distance_cache.get_or_build(locations, self.distance_storage, self.metric)
 
     def calculate_distance(self, point1: Tuple[float, float], point2: Tuple[float, float]) -> float:
-        return np.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
+        if self.metric != "euclidean":
+            return point_distances(point1, point2, self.metric)
+        # Squared with a plain multiply, as the matrix builder does, so both give identical values
+        dx = point1[0] - point2[0]
+        dy = point1[1] - point2[1]
+        return np.sqrt(dx * dx + dy * dy)
+
+    def optimize_deliveries(self, engine: str = "greedy", neighbours: int = 16, local_search: bool = False,
+                            time_budget: float = None, iteration_budget: int = None, stats: bool = False,
+                            profile: bool = False, trace_memory: bool = False, progress=None, cancel=None):
+        # engine: "greedy" (scalar loop), "vectorized" (same result, NumPy scoring),
+        # "fleet" (same result again, scoring all agents of a round in one batch; fastest
+        # with hundreds of agents),
+        # "granular" (only scores the `neighbours` nearest unserved customers per step) or
+        # "savings" (Clarke-Wright trips from the `neighbours` best savings per customer;
+        # slower to build but much shorter routes).
+        # local_search runs improve_routes on the result within the given budgets.
+        # With stats, profile or trace_memory a SolveStats is returned as a third value,
+        # holding phase times, loop counters and the cProfile / tracemalloc captures.
+        # progress is called with SolveProgress reports (partial routes) while solving and
+        # once with the final routes; setting cancel (e.g. a threading.Event) stops the solve
+        # early with the routes built so far.
+        if self.max_distances is None:
+            raise ValueError("Max distances not set. Call set_max_distances before optimizing.")
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}'. Use one of {', '.join(ENGINES)}.")
+        if engine == "greedy" and self.distance_file is not None:
+            raise ValueError("The greedy engine measures distances from coordinates; use another engine "
+                             "with a distance file.")
+        reporter = None if progress is None and cancel is None else ProgressReporter(progress, cancel)
+        if not (stats or profile or trace_memory):
+            return self._solve(engine, neighbours, local_search, time_budget, iteration_budget, reporter=reporter)
+
+        solve_stats = SolveStats(profile, trace_memory)
+        solve_stats.engine = engine
+        for name in ("load", "precompute"):
+            if name in self.phase_seconds:
+                solve_stats.phase_seconds[name] = self.phase_seconds[name]
+        with solve_stats.capture():
+            routes, parcels_delivered = self._solve(engine, neighbours, local_search, time_budget,
+                                                    iteration_budget, solve_stats, reporter)
+        with solve_stats.phase("cost_calc"):
+            solve_stats.total_distance = float(sum(self.calculate_route_costs(routes)[1]))
+        return routes, parcels_delivered, solve_stats
+
+    def _solve(self, engine, neighbours, local_search, time_budget, iteration_budget, stats=None, reporter=None):
+        phase = nullcontext if stats is None else stats.phase
+        with phase("construct"):
+            if engine == "greedy":
+                routes, parcels_delivered = self._optimize_greedy(stats, reporter)
+            else:
+                routes, parcels_delivered = self._optimize_arrays(engine, neighbours, stats, reporter)
+        if local_search and not (reporter and reporter.cancelled()):
+            with phase("local_search"):
+                routes, parcels_delivered = self.improve_routes(routes, parcels_delivered, time_budget,
+                                                                iteration_budget, reporter and reporter.cancel)
+        if reporter is not None:
+            reporter.finish(routes, parcels_delivered)
+        return routes, parcels_delivered
+
+    def improve_routes(self, routes, parcels_delivered, time_budget: float = None, iteration_budget: int = None,
+                       cancel=None):
+        # Local search (2-opt, or-opt, relocate, swap) that keeps capacity and max distance limits
+        capacities = self.fleet.capacity.tolist()
+        max_distances = self.fleet.max_distance.tolist()
+        return improve_routes(self.distance_matrix, routes, parcels_delivered, capacities, max_distances,
+                              time_budget, iteration_budget, cancel)
+
+    def start_session(self, routes=None, parcels_delivered=None, engine: str = "vectorized"):
+        # Incremental session on top of a solved plan (solved with `engine` if not given):
+        # parcels can be added or cancelled and fleet limits changed without a full re-solve
+        if self.max_distances is None:
+            raise ValueError("Max distances not set. Call set_max_distances before optimizing.")
+        return RoutingSession(self, routes, parcels_delivered, engine)
+
+    def _optimize_arrays(self, engine, neighbours, stats=None, reporter=None):
+        demand = self.parcels.num_parcels.copy()  # Private copy, the engines consume it
+        capacities = self.fleet.capacity.tolist()
+        max_distances = self.fleet.max_distance.tolist()
+        if engine == "fleet":
+            return greedy_fleet(self.distance_matrix, demand, self.fleet, stats=stats, reporter=reporter)
+        if engine == "savings":
+            return savings_solve(self.distance_matrix, demand, capacities, max_distances, neighbours,
+                                 self.parcels.destinations, stats, reporter)
+        if engine == "granular":
+            return greedy_granular(self.distance_matrix, self.depot_location, self.parcels.destinations,
+                                   demand, capacities, max_distances, neighbours, stats=stats, reporter=reporter)
+        return greedy_vectorized(self.distance_matrix, demand, capacities, max_distances, stats=stats,
+                                 reporter=reporter)
 
-    def optimize_deliveries(self):
+    def optimize_multistart(self, num_starts: int = 8, seed: int = 0, noise: float = 0.5, workers: int = None):
+        # Best of the plain greedy and num_starts - 1 randomized runs, solved in a process pool
         if self.max_distances is None:
             raise ValueError("Max distances not set. Call set_max_distances before optimizing.")
+        capacities = self.fleet.capacity.tolist()
+        max_distances = self.fleet.max_distance.tolist()
+        routes, parcels_delivered, _ = multistart_solve(self.distance_matrix, self.parcels.num_parcels, capacities,
+                                                        max_distances, num_starts, seed, noise, workers)
+        return routes, parcels_delivered
+
+    def optimize_decomposed(self, method: str = "sweep", engine: str = "vectorized", neighbours: int = 16,
+                            workers: int = None):
+        # Cluster first, route second: each agent gets a sweep sector or capacity-weighted
+        # k-means cluster of the customers, and the clusters are solved in parallel with
+        # engine "vectorized", "fleet", "granular" or "savings"
+        if self.max_distances is None:
+            raise ValueError("Max distances not set. Call set_max_distances before optimizing.")
+        capacities = self.fleet.capacity.tolist()
+        max_distances = self.fleet.max_distance.tolist()
+        routes, parcels_delivered, _ = decomposed_solve(self.depot_location, self.parcels.destinations,
+                                                        self.parcels.num_parcels, capacities, max_distances,
+                                                        method, engine, neighbours, workers, self.metric,
+                                                        self.distance_matrix if self.distance_file else None)
+        return routes, parcels_delivered
 
+    def sweep(self, num_agents, capacities, max_distances, engine: str = "vectorized", neighbours: int = 16,
+              workers: int = None):
+        # Solve the loaded parcels for every combination of agent count, capacity and max
+        # distance, reusing this agent's distance matrix; one row dict per setting. The
+        # fleet and capacity_per_agent are left as they are.
+        return sweep_fleet(self.distance_matrix, self.parcels.num_parcels, num_agents, capacities, max_distances,
+                           engine, neighbours, workers, self.depot_location, self.parcels.destinations)
+
+    def _optimize_greedy(self, stats=None, reporter=None):
+        destinations = [tuple(d) for d in self.parcels.destinations.tolist()]
+        demand = self.parcels.num_parcels.tolist()  # Private copy, consumed as parcels are delivered
         unassigned_parcels = list(range(len(self.parcels)))
-        routes = [[] for _ in self.delivery_agents]
-        parcels_delivered = [[] for _ in self.delivery_agents]
-        agent_loads = [0 for _ in self.delivery_agents]
-        agent_distances = [0 for _ in self.delivery_agents]
+        capacities = self.fleet.capacity.tolist()
+        max_distances = self.fleet.max_distance.tolist()
+        routes = [[] for _ in capacities]
+        parcels_delivered = [[] for _ in capacities]
+        agent_loads = [0 for _ in capacities]
+        agent_distances = [0 for _ in capacities]
 
-        max_iterations = len(self.parcels) * len(self.delivery_agents) * 2
+        max_iterations = len(self.parcels) * len(capacities) * 2
         iteration_count = 0
 
         while unassigned_parcels and iteration_count < max_iterations:
+            if reporter is not None:
+                if iteration_count and reporter.cancelled():
+                    break  # After the first round, so every route has its depot start
+                reporter.update(iteration_count, max_iterations, len(unassigned_parcels), routes, parcels_delivered)
             iteration_count += 1
-            for i, agent in enumerate(self.delivery_agents):
+            for i in range(len(capacities)):
                 if not unassigned_parcels:
                     break
 
@@ -91,89 +277,108 @@ class MasterRoutingAgent:
                     routes[i].append(-1)  # Start from depot
                     parcels_delivered[i].append(0)  # No parcels delivered at depot
 
-                current_location = self.depot_location if routes[i][-1] == -1 else self.parcels[routes[i][-1]].destination
+                current_location = self.depot_location if routes[i][-1] == -1 else destinations[routes[i][-1]]
                 
                 best_next = None
                 best_score = float('-inf')
+                if stats is not None:
+                    stats.candidate_evaluations += len(unassigned_parcels)
                 for j in unassigned_parcels:
-                    next_location = self.parcels[j].destination
+                    next_location = destinations[j]
                     distance_to_next = self.calculate_distance(current_location, next_location)
                     distance_to_depot = self.calculate_distance(next_location, self.depot_location)
                     total_distance = agent_distances[i] + distance_to_next + distance_to_depot
 
-                    if total_distance <= agent.max_distance:
-                        remaining_capacity = agent.capacity - agent_loads[i]
-                        parcels_to_deliver = min(remaining_capacity, self.parcels[j].num_parcels)
+                    if total_distance <= max_distances[i]:
+                        remaining_capacity = capacities[i] - agent_loads[i]
+                        parcels_to_deliver = min(remaining_capacity, demand[j])
                         score = parcels_to_deliver - (distance_to_next / 1000)  # Prioritize parcels over distance
                         if score > best_score:
                             best_next = j
                             best_score = score
 
-                if best_next is None or agent_loads[i] >= agent.capacity:
+                if best_next is None or agent_loads[i] >= capacities[i]:
                     # Return to depot
                     if routes[i][-1] != -1:
                         routes[i].append(-1)
                         parcels_delivered[i].append(0)  # No parcels delivered when returning to depot
                         agent_distances[i] += self.calculate_distance(current_location, self.depot_location)
+                        if stats is not None:
+                            stats.depot_returns += 1
                     agent_loads[i] = 0
                     continue
 
                 routes[i].append(best_next)
-                parcels_to_deliver = min(agent.capacity - agent_loads[i], self.parcels[best_next].num_parcels)
+                parcels_to_deliver = min(capacities[i] - agent_loads[i], demand[best_next])
                 parcels_delivered[i].append(parcels_to_deliver)
                 agent_loads[i] += parcels_to_deliver
-                agent_distances[i] += self.calculate_distance(current_location, self.parcels[best_next].destination)
+                agent_distances[i] += self.calculate_distance(current_location, destinations[best_next])
 
-                self.parcels[best_next].num_parcels -= parcels_to_deliver
-                if self.parcels[best_next].num_parcels == 0:
+                demand[best_next] -= parcels_to_deliver
+                if demand[best_next] == 0:
                     unassigned_parcels.remove(best_next)
 
-        # Ensure all routes end at the depot
+        if stats is not None:
+            stats.outer_iterations += iteration_count
+            if unassigned_parcels and iteration_count >= max_iterations:
+                stats.max_iteration_hits += 1
+
+        # Ensure all routes end at the depot; agents never reached keep an empty route
         for i, route in enumerate(routes):
-            if route[-1] != -1:
+            if route and route[-1] != -1:
                 routes[i].append(-1)
                 parcels_delivered[i].append(0)
-                agent_distances[i] += self.calculate_distance(self.parcels[route[-2]].destination, self.depot_location)
+                agent_distances[i] += self.calculate_distance(destinations[route[-2]], self.depot_location)
 
         return routes, parcels_delivered
 
     def calculate_route_costs(self, routes):
-        costs = []
-        total_distances = []
-        for route in routes:
-            cost = 0
-            distance = 0
-            current_location = 0  # Starting at the depot
-            for stop in route:
-                next_location = 0 if stop == -1 else stop + 1  # adding 1 as depot is at position 0
-                leg_distance = self.distance_matrix[current_location][next_location]
-                cost += leg_distance
-                distance += leg_distance
-                current_location = next_location
-            costs.append(cost)
-            total_distances.append(distance)
+        # routes: route lists or CompactRoutes. Cost is the distance travelled.
+        start = time.perf_counter()
+        compact = routes if isinstance(routes, CompactRoutes) else CompactRoutes.from_routes(routes)
+        total_distances = compact.route_distances(self.distance_matrix).tolist()
+        costs = list(total_distances)
+        self.phase_seconds["cost_calc"] = time.perf_counter() - start
         return costs, total_distances
 
-    def calculate_detailed_route_costs(self, routes, parcels_delivered):
+    def calculate_detailed_route_costs(self, routes, parcels_delivered=None):
+        # Per route, the (label, cost, parcels) of every non-zero leg and a "Total" row.
+        # Costs are computed on CompactRoutes; the label strings are only built here.
+        if isinstance(routes, CompactRoutes):
+            compact = routes
+        else:
+            compact = CompactRoutes.from_routes(routes, parcels_delivered)
+        if compact.parcels is None:
+            compact = CompactRoutes(compact.stops, compact.offsets, np.zeros_like(compact.stops))
+        legs = compact.leg_costs(self.distance_matrix)
+        totals = compact.route_distances(self.distance_matrix, legs).tolist()
+        route_parcels = compact.parcels_per_route().tolist()
+        moving = np.flatnonzero(legs > 0)  # Only non-zero cost movements
+        stops = compact.stops[moving].tolist()
+        parcels = compact.parcels[moving].tolist()
+        costs = legs[moving].tolist()
+        bounds = np.searchsorted(moving, compact.offsets).tolist()
+        customer_ids = self.parcels.customer_ids
+
         detailed_costs = []
-        for route, parcels in zip(routes, parcels_delivered):
+        for a in range(len(compact)):
             route_details = []
-            total_cost = 0
-            current_location = 0
-            for stop, num_parcels in zip(route, parcels):
-                next_location = 0 if stop == -1 else stop + 1
-                cost = self.distance_matrix[current_location][next_location]
-                if cost > 0:  # Only add non-zero cost movements
-                    if stop == -1:
-                        route_details.append(("Return to Depot", cost, 0))
-                    else:
-                        route_details.append((f"Customer {self.parcels[stop].customer_id}", cost, num_parcels))
-                    total_cost += cost
-                current_location = next_location
-            route_details.append(("Total", total_cost, sum(parcels)))
+            for k in range(bounds[a], bounds[a + 1]):
+                if stops[k] == -1:
+                    route_details.append(("Return to Depot", costs[k], 0))
+                else:
+                    route_details.append((f"Customer {customer_ids[stops[k]]}", costs[k], parcels[k]))
+            route_details.append(("Total", totals[a], route_parcels[a]))
             detailed_costs.append(route_details)
         return detailed_costs
 
+    def simulate(self, routes, parcels_delivered, speed: float = 1.0, service_time: float = 0.0,
+                 time_per_parcel: float = 0.0, load_time: float = 0.0, load_time_per_parcel: float = 0.0,
+                 loading_bays: int = None, start_times=None, shift_end: float = None):
+        # Replay a plan as an event-driven day for the fleet; see simulator.simulate
+        return simulate(self.distance_matrix, routes, parcels_delivered, self.fleet, speed, service_time,
+                        time_per_parcel, load_time, load_time_per_parcel, loading_bays, start_times, shift_end)
+
     def print_routes(self, routes):
         for i, route in enumerate(routes):
             print(f"Route for DA_{i + 1}:")
@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from CartesianPlane import generate_random_points
+from MRA import MasterRoutingAgent, load_parcels_from_file
+from parcels import Package, ParcelTable
+
+DEFAULT_SIZES = (100, 500, 1000, 5000, 10000, 50000)
+STAGES = ("load_parcels", "precompute_distances", "optimize_deliveries", "route_costs")
+
+# Above this many customers "auto" switches to lazy distances and the granular engine,
+# since a dense matrix of 50k customers alone would need 20 GB
+DENSE_LIMIT = 5000
+
+# Stage times below this many seconds are too noisy to gate on
+MIN_GATED_SECONDS = 0.01
+
+
+def resolve_setup(num_customers, engine, storage, num_agents):
+    if engine == "auto":
+        engine = "vectorized" if num_customers <= DENSE_LIMIT else "granular"
+    if storage == "auto":
+        storage = "float64" if num_customers <= DENSE_LIMIT else "lazy"
+    if num_agents is None:
+        num_agents = max(2, num_customers // 100)
+    return engine, storage, num_agents
+
+
+def write_instance(num_customers, seed, filename):
+    # Same generators as the GUI: depot and customers uniform on the 100 x 100 plane
+    random.seed(seed)
+    points = generate_random_points(num_customers, 0, 100, 0, 100)
+    depot = generate_random_points(1, 0, 100, 0, 100)[0]
+    Package.save_packages(Package.create_parcels(num_customers, points), filename)
+    return depot
+
+
+def _measure(stage, memory):
+    # Runs stage() once for its time and, if memory is set, once more under tracemalloc
+    # for its peak allocation, so tracing never slows down the timed run
+    start = time.perf_counter()
+    result = stage()
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        tracemalloc.start()
+        stage()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def run_instance(num_customers, seed, engine, storage, num_agents, capacity, max_distance, repeat=1, memory=True):
+    engine, storage, num_agents = resolve_setup(num_customers, engine, storage, num_agents)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "parcels.txt")
+        depot = write_instance(num_customers, seed, filename)
+        mra = MasterRoutingAgent(depot, num_agents, capacity, storage)
+        mra.distance_cache = None  # Time the matrix build itself, not a cache hit
+
+        def load():
+            return load_parcels_from_file(filename)
+
+        def precompute():
+            mra._precompute_distances()
+
+        def optimize():
+            return mra.optimize_deliveries(engine)
+
+        def costs():
+            return mra.calculate_route_costs(routes)
+
+        times = {stage: [] for stage in STAGES}
+        peaks = {}
+        for r in range(repeat):
+            track = memory and r == 0
+            packages, seconds, peaks["load_parcels"] = _measure(load, track)
+            times["load_parcels"].append(seconds)
+            mra.parcels = ParcelTable.from_packages(packages)
+            _, seconds, peaks["precompute_distances"] = _measure(precompute, track)
+            times["precompute_distances"].append(seconds)
+            if r == 0:
+                mra._adjust_capacity()
+                mra.set_max_distances([max_distance] * num_agents)
+            (routes, parcels_delivered), seconds, peaks["optimize_deliveries"] = _measure(optimize, track)
+            times["optimize_deliveries"].append(seconds)
+            (_, total_distances), seconds, peaks["route_costs"] = _measure(costs, track)
+            times["route_costs"].append(seconds)
+
+    demand = int(mra.parcels.num_parcels.sum())
+    delivered = sum(sum(parcels) for parcels in parcels_delivered)
+    violations = sum(1 for agent, distance in zip(mra.delivery_agents, total_distances)
+                     if distance > agent.max_distance + 1e-6)
+    return {
+        "customers": num_customers,
+        "seed": seed,
+        "engine": engine,
+        "storage": storage,
+        "agents": num_agents,
+        "capacity": mra.capacity_per_agent,
+        "max_distance": max_distance,
+        "seconds": {stage: min(values) for stage, values in times.items()},
+        "peak_bytes": peaks if memory else None,
+        "quality": {
+            "total_distance": float(sum(total_distances)),
+            "undelivered_parcels": demand - delivered,
+            "max_distance_violations": violations,
+        },
+    }
+
+
+def run_key(run):
+    # Runs are only comparable with the same instance and the same fleet
+    return (run["customers"], run["seed"], run["engine"], run["storage"], run["agents"], run["capacity"],
+            run["max_distance"])
+
+
+def compare(results, baseline, threshold):
+    # Regressions of results against a baseline report: a stage slower, or using more
+    # memory, by more than `threshold` (a fraction), or a worse solution
+    baseline_runs = {run_key(run): run for run in baseline["runs"]}
+    failures = []
+    for run in results["runs"]:
+        old = baseline_runs.get(run_key(run))
+        if old is None:
+            continue
+        label = "n={} seed={} {}/{} agents={} capacity={} max_distance={}".format(*run_key(run))
+        for stage in STAGES:
+            new_seconds, old_seconds = run["seconds"][stage], old["seconds"][stage]
+            if new_seconds > max(old_seconds * (1 + threshold), MIN_GATED_SECONDS):
+                failures.append(f"{label}: {stage} took {new_seconds:.4f}s, baseline {old_seconds:.4f}s")
+            if run["peak_bytes"] and old["peak_bytes"]:
+                new_peak, old_peak = run["peak_bytes"][stage], old["peak_bytes"][stage]
+                if new_peak > old_peak * (1 + threshold) and new_peak - old_peak > 1 << 20:
+                    failures.append(f"{label}: {stage} peaked at {new_peak} bytes, baseline {old_peak}")
+        new_quality, old_quality = run["quality"], old["quality"]
+        if new_quality["undelivered_parcels"] > old_quality["undelivered_parcels"]:
+            failures.append(f"{label}: {new_quality['undelivered_parcels']} parcels undelivered, "
+                            f"baseline {old_quality['undelivered_parcels']}")
+        if new_quality["max_distance_violations"] > old_quality["max_distance_violations"]:
+            failures.append(f"{label}: {new_quality['max_distance_violations']} max distance violations, "
+                            f"baseline {old_quality['max_distance_violations']}")
+        if new_quality["total_distance"] > old_quality["total_distance"] * (1 + threshold):
+            failures.append(f"{label}: total distance {new_quality['total_distance']:.2f}, "
+                            f"baseline {old_quality['total_distance']:.2f}")
+    return failures
+
+
+def print_summary(results):
+    print(f"{'customers':>9} {'engine':>10} {'storage':>8} " + " ".join(f"{stage:>20}" for stage in STAGES)
+          + f" {'distance':>12} {'undelivered':>11}")
+    for run in results["runs"]:
+        print(f"{run['customers']:>9} {run['engine']:>10} {run['storage']:>8} "
+              + " ".join(f"{run['seconds'][stage]:>19.4f}s" for stage in STAGES)
+              + f" {run['quality']['total_distance']:>12.2f} {run['quality']['undelivered_parcels']:>11}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the MRA pipeline over growing random instances.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--engine", default="auto", help="greedy, vectorized, fleet, granular, savings or auto")
+    parser.add_argument("--storage", default="auto", help="float64, float32, condensed, lazy or auto")
+    parser.add_argument("--agents", type=int, default=None, help="default: one per 100 customers, at least 2")
+    # Defaults under which every default instance can be fully delivered. A fleet that
+    # stalls gets the exact engines' depot padding, and timing that is not useful.
+    parser.add_argument("--capacity", type=int, default=50)
+    parser.add_argument("--max-distance", type=float, default=2000.0)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per instance, the fastest time is kept")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak measurements")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="JSON report to compare against; exits 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, as a fraction")
+    args = parser.parse_args(argv)
+
+    runs = []
+    for num_customers in args.sizes:
+        for seed in args.seeds:
+            runs.append(run_instance(num_customers, seed, args.engine, args.storage, args.agents, args.capacity,
+                                     args.max_distance, args.repeat, not args.no_memory))
+    results = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "runs": runs,
+    }
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+        print_summary(results)
+    else:
+        print(report)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failures = compare(results, baseline, args.threshold)
+        for failure in failures:
+            print("REGRESSION " + failure, file=sys.stderr)
+        if failures:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
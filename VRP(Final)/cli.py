@@ -0,0 +1,228 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from MRA import ENGINES, MasterRoutingAgent
+from distances import DISTANCE_STORAGES, METRICS
+from local_search import routes_to_trips, trips_to_routes
+
+# Headless batch solver: no tkinter or matplotlib, only the solver modules are imported.
+# --render also draws each plan's route map with render.py (matplotlib Agg, no display).
+#   python cli.py depots/ --depot-file depots/depots.csv --output-dir plans/ --agents 4 --capacity 10 \
+#       --max-distance 200 --render png
+# Parcel files carry no depot: each file's depot comes from --depot-file (rows of file,x,y),
+# and --depot, if given, covers the files it does not list.
+
+
+def find_parcel_files(inputs, pattern="*.txt"):
+    # Files named on the command line, files matching globs, and `pattern` inside directories
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            files.extend(sorted(glob.glob(os.path.join(item, pattern))))
+        elif glob.has_magic(item):
+            files.extend(sorted(glob.glob(item)))
+        else:
+            files.append(item)
+    return list(dict.fromkeys(files))
+
+
+def load_depots(path):
+    # Depot of each parcel file from a CSV of file,x,y rows; a header row is skipped.
+    # Relative file names are taken relative to the CSV's directory.
+    base = os.path.dirname(os.path.abspath(path))
+    depots = {}
+    with open(path, newline="") as f:
+        for row_number, row in enumerate(csv.reader(f), 1):
+            if not any(field.strip() for field in row):
+                continue
+            if len(row) != 3:
+                raise ValueError(f"{path}, row {row_number}: expected file,x,y")
+            name, x, y = (field.strip() for field in row)
+            try:
+                depot = [float(x), float(y)]
+            except ValueError:
+                if row_number == 1:
+                    continue
+                raise ValueError(f"{path}, row {row_number}: invalid depot coordinates") from None
+            depots[os.path.normpath(os.path.join(base, name))] = depot
+    return depots
+
+
+def assign_depots(files, depots, default=None):
+    # Depot per file: its --depot-file entry, else ``default``. Files left without one are
+    # an error rather than being solved from some arbitrary point.
+    assigned = {filename: depots.get(os.path.abspath(filename), default) for filename in files}
+    missing = [filename for filename, depot in assigned.items() if depot is None]
+    if missing:
+        raise ValueError(f"No depot for {len(missing)} file(s): {', '.join(missing[:5])}"
+                         f"{' ...' if len(missing) > 5 else ''}. List them in --depot-file or pass --depot.")
+    return assigned
+
+
+def solve_file(filename, options):
+    # Solve one parcel file and write its plan as JSON. Returns a short summary.
+    start = time.perf_counter()
+    mra = MasterRoutingAgent(tuple(options["depot"]), options["agents"], options["capacity"], options["storage"],
+                             options["metric"])
+    mra.distance_file = options["distance_file"]
+    mra.load_parcels(filename, options["use_cache"])
+    max_distances = options["max_distance"]
+    if len(max_distances) == 1:
+        max_distances = max_distances * options["agents"]
+    mra.set_max_distances(max_distances)
+
+    if options["multistart"] > 1:
+        routes, parcels_delivered = mra.optimize_multistart(options["multistart"], options["seed"], workers=1)
+        if options["local_search"]:
+            routes, parcels_delivered = mra.improve_routes(routes, parcels_delivered, options["time_budget"])
+    else:
+        routes, parcels_delivered = mra.optimize_deliveries(options["engine"], local_search=options["local_search"],
+                                                            time_budget=options["time_budget"])
+    # Stalled fleets leave runs of depot starts; drop them, they add no distance
+    routes, parcels_delivered = trips_to_routes(routes_to_trips(routes, parcels_delivered))
+    costs, total_distances = mra.calculate_route_costs(routes)
+
+    demand = int(mra.parcels.num_parcels.sum())
+    delivered = sum(sum(parcels) for parcels in parcels_delivered)
+    plan = {
+        "parcel_file": os.path.abspath(filename),
+        "depot": list(mra.depot_location),
+        "engine": "multistart" if options["multistart"] > 1 else options["engine"],
+        "capacity_per_agent": mra.capacity_per_agent,
+        "parcels_total": demand,
+        "parcels_delivered": delivered,
+        "malformed_rows": mra.parcels.malformed,
+        "total_distance": float(sum(total_distances)),
+        "agents": [
+            {
+                "id": agent.da_id,
+                "capacity": agent.capacity,
+                "max_distance": agent.max_distance,
+                "distance": float(distance),
+                "cost": float(cost),
+                "stops": [
+                    {"customer_id": None if stop == -1 else mra.parcels[stop].customer_id,
+                     "parcel_index": stop, "parcels": int(num_parcels)}
+                    for stop, num_parcels in zip(route, parcels)
+                ],
+            }
+            for agent, route, parcels, cost, distance in zip(mra.delivery_agents, routes, parcels_delivered, costs,
+                                                             total_distances)
+        ],
+    }
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    output = os.path.join(options["output_dir"], stem + ".json")
+    with open(output, "w") as f:
+        json.dump(plan, f, indent=1 if options["pretty"] else None)
+    if options["render"]:
+        from render import render_plan
+        render_plan(output, os.path.join(options["output_dir"], stem + "." + options["render"]))
+    return {
+        "file": filename,
+        "output": output,
+        "delivered": delivered,
+        "total": demand,
+        "malformed": mra.parcels.malformed,
+        "distance": plan["total_distance"],
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def _solve_safely(args):
+    filename, options = args
+    try:
+        return solve_file(filename, options), None
+    except Exception as e:
+        # Any failure is that file's result; the rest of the batch carries on
+        return None, f"{filename}: {type(e).__name__}: {e}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve parcel files without the GUI and write JSON plans.")
+    parser.add_argument("inputs", nargs="+", help="parcel files, globs or directories")
+    parser.add_argument("--pattern", default="*.txt", help="file pattern used inside directories")
+    parser.add_argument("--output-dir", default="plans")
+    parser.add_argument("--depot-file", help="CSV of file,x,y rows giving each parcel file's depot")
+    parser.add_argument("--depot", type=float, nargs=2, metavar=("X", "Y"),
+                        help="depot of the files not listed in --depot-file")
+    parser.add_argument("--agents", type=int, default=2)
+    parser.add_argument("--capacity", type=int, default=10)
+    parser.add_argument("--max-distance", type=float, nargs="+", default=[200.0],
+                        help="one value for every agent, or one per agent")
+    parser.add_argument("--engine", default="vectorized", choices=ENGINES)
+    parser.add_argument("--storage", default="float64", choices=DISTANCE_STORAGES)
+    parser.add_argument("--metric", default="euclidean", choices=METRICS,
+                        help="haversine reads x as longitude and y as latitude")
+    parser.add_argument("--distance-file", help="square .npy matrix (depot first, then the parcels in file "
+                                                "order) to take distances from instead of the coordinates")
+    parser.add_argument("--local-search", action="store_true")
+    parser.add_argument("--time-budget", type=float, default=None, help="seconds of local search per file")
+    parser.add_argument("--multistart", type=int, default=1, help="greedy starts per file (1 = plain greedy)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per CPU)")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write parcel file caches")
+    parser.add_argument("--pretty", action="store_true", help="indent the JSON output")
+    parser.add_argument("--render", choices=("png", "svg", "pdf"), help="also write a route map per plan")
+    args = parser.parse_args(argv)
+
+    if len(args.max_distance) not in (1, args.agents):
+        parser.error("--max-distance takes one value or one per agent")
+    files = find_parcel_files(args.inputs, args.pattern)
+    if not files:
+        parser.error("no parcel files found")
+    try:
+        depots = assign_depots(files, load_depots(args.depot_file) if args.depot_file else {}, args.depot)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    os.makedirs(args.output_dir, exist_ok=True)
+    options = {
+        "agents": args.agents,
+        "capacity": args.capacity,
+        "max_distance": args.max_distance,
+        "engine": args.engine,
+        "storage": args.storage,
+        "metric": args.metric,
+        "distance_file": args.distance_file,
+        "local_search": args.local_search,
+        "time_budget": args.time_budget,
+        "multistart": args.multistart,
+        "seed": args.seed,
+        "use_cache": not args.no_cache,
+        "output_dir": args.output_dir,
+        "pretty": args.pretty,
+        "render": args.render,
+    }
+
+    jobs = [(filename, dict(options, depot=depots[filename])) for filename in files]
+    workers = min(len(jobs), args.workers or os.cpu_count() or 1)
+    if workers <= 1:
+        results = map(_solve_safely, jobs)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_solve_safely, jobs)
+
+    failures = 0
+    try:
+        for summary, error in results:
+            if error:
+                failures += 1
+                print(f"FAILED {error}", file=sys.stderr)
+            else:
+                skipped = f", {summary['malformed']} malformed rows skipped" if summary["malformed"] else ""
+                print(f"{summary['file']}: {summary['delivered']}/{summary['total']} parcels{skipped}, "
+                      f"distance {summary['distance']:.2f}, {summary['seconds']:.2f}s -> {summary['output']}")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    print(f"Solved {len(files) - failures} of {len(files)} files")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from distances import build_distance_matrix
+from DA import Fleet
+from engines import greedy_fleet, greedy_granular, greedy_vectorized
+from savings import savings_solve
+
+PARTITION_METHODS = ("sweep", "kmeans")
+PARTITION_ENGINES = ("vectorized", "fleet", "granular", "savings")
+
+
+def _quotas(demand, capacities):
+    # Parcels each agent should receive, in proportion to its capacity
+    capacities = np.asarray(capacities, dtype=np.float64)
+    return float(np.sum(demand)) * capacities / capacities.sum()
+
+
+def sweep_partition(depot_location, destinations, demand, capacities):
+    # Sort customers by angle around the depot and cut the circle into one sector per
+    # agent, each holding about that agent's capacity share of the parcels.
+    # Returns one array of parcel indices per agent.
+    destinations = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+    demand = np.asarray(demand, dtype=np.float64)
+    offsets = destinations - np.asarray(depot_location, dtype=np.float64)
+    order = np.argsort(np.arctan2(offsets[:, 1], offsets[:, 0]), kind="stable")
+    # Parcel j's midpoint along the sweep decides its sector
+    cumulative = np.cumsum(demand[order]) - demand[order] / 2
+    bounds = np.cumsum(_quotas(demand, capacities))[:-1]
+    sector = np.searchsorted(bounds, cumulative, side="right")
+    return [order[sector == a] for a in range(len(capacities))]
+
+
+def kmeans_partition(depot_location, destinations, demand, capacities, max_rounds: int = 10, slack: float = 1.05):
+    # Capacity-weighted k-means: centroids are parcel-weighted means, and each round
+    # assigns customers to their nearest centroid that still has room, where an agent's
+    # room is its capacity share of the parcels times ``slack``. Customers with the most
+    # to lose from not getting their nearest centroid are placed first. Starts from the
+    # sweep sectors, so the result is deterministic. Returns parcel indices per agent.
+    destinations = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+    demand = np.asarray(demand, dtype=np.float64)
+    num_agents = len(capacities)
+    room = _quotas(demand, capacities) * slack
+    assignment = np.empty(len(destinations), dtype=int)
+    for a, members in enumerate(sweep_partition(depot_location, destinations, demand, capacities)):
+        assignment[members] = a
+
+    for _ in range(max_rounds):
+        weights = np.bincount(assignment, weights=demand, minlength=num_agents)
+        centroids = np.column_stack((np.bincount(assignment, weights=demand * destinations[:, 0], minlength=num_agents),
+                                     np.bincount(assignment, weights=demand * destinations[:, 1], minlength=num_agents)))
+        empty = weights == 0
+        centroids[~empty] /= weights[~empty, None]
+        centroids[empty] = depot_location
+
+        delta = destinations[:, None, :] - centroids[None, :, :]
+        distances = np.sqrt(delta[..., 0] * delta[..., 0] + delta[..., 1] * delta[..., 1])
+        nearest = np.argmin(distances, axis=1)
+        if num_agents > 1:
+            ranked = np.partition(distances, 1, axis=1)
+            order = np.argsort(ranked[:, 0] - ranked[:, 1], kind="stable")  # Largest regret first
+        else:
+            order = np.arange(len(destinations))
+
+        new_assignment = np.empty_like(assignment)
+        load = [0.0] * num_agents
+        room_left = room.tolist()
+        parcels = demand.tolist()
+        first_choice = nearest.tolist()
+        for j in order.tolist():
+            a = first_choice[j]
+            if load[a] + parcels[j] > room_left[a]:
+                # Nearest is full: take the nearest one with room, or stay if none has any
+                for b in np.argsort(distances[j], kind="stable").tolist():
+                    if load[b] + parcels[j] <= room_left[b]:
+                        a = b
+                        break
+            new_assignment[j] = a
+            load[a] += parcels[j]
+
+        if np.array_equal(new_assignment, assignment):
+            break
+        assignment = new_assignment
+    return [np.flatnonzero(assignment == a) for a in range(num_agents)]
+
+
+def partition_customers(depot_location, destinations, demand, capacities, method="sweep"):
+    if method == "sweep":
+        return sweep_partition(depot_location, destinations, demand, capacities)
+    if method == "kmeans":
+        return kmeans_partition(depot_location, destinations, demand, capacities)
+    raise ValueError(f"Unknown partition method '{method}'. Use one of {', '.join(PARTITION_METHODS)}.")
+
+
+def solve_partition(depot_location, destinations, demand, capacity, max_distance, engine="vectorized",
+                    neighbours=16, metric="euclidean", distance_matrix=None):
+    # One agent serving one cluster. Routes use the cluster's own parcel numbering.
+    # distance_matrix, if given, covers the depot and the cluster's customers; otherwise
+    # one is built from the coordinates.
+    if engine not in PARTITION_ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Use one of {', '.join(PARTITION_ENGINES)}.")
+    if not len(demand):
+        return [-1], [0]
+    locations = np.vstack(([depot_location], destinations))
+    demand = np.array(demand, dtype=np.int64)
+    if distance_matrix is None:
+        distance_matrix = build_distance_matrix(locations, "lazy" if engine == "granular" else "float64", metric)
+    if engine == "granular":
+        routes, parcels_delivered = greedy_granular(distance_matrix, depot_location, destinations, demand,
+                                                    [capacity], [max_distance], neighbours)
+    elif engine == "savings":
+        routes, parcels_delivered = savings_solve(distance_matrix, demand, [capacity], [max_distance], neighbours,
+                                                  destinations)
+    elif engine == "fleet":
+        routes, parcels_delivered = greedy_fleet(distance_matrix, demand, Fleet([capacity], [max_distance]))
+    else:
+        routes, parcels_delivered = greedy_vectorized(distance_matrix, demand, [capacity], [max_distance])
+    return routes[0], parcels_delivered[0]
+
+
+def _solve_job(job):
+    return solve_partition(*job)
+
+
+def decomposed_solve(depot_location, destinations, demand, capacities, max_distances, method="sweep",
+                     engine="vectorized", neighbours=16, workers=None, metric="euclidean", distance_matrix=None):
+    # Cluster first, route second: give every agent its own part of the customers and
+    # solve the parts independently, in worker processes when workers > 1. Each worker only
+    # gets its cluster's coordinates and builds a small distance matrix of its own, or,
+    # when a MappedDistanceMatrix is passed, reads its cluster's distances from that file.
+    # Returns routes and parcels_delivered in the usual format plus the partition.
+    if engine not in PARTITION_ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Use one of {', '.join(PARTITION_ENGINES)}.")
+    destinations = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+    demand = np.asarray(demand)
+    depot_location = tuple(float(c) for c in depot_location)
+    parts = partition_customers(depot_location, destinations, demand, capacities, method)
+    jobs = [(depot_location, destinations[part], demand[part], capacity, max_distance, engine, neighbours, metric,
+             None if distance_matrix is None else distance_matrix.subset(np.concatenate(([0], part + 1))))
+            for part, capacity, max_distance in zip(parts, capacities, max_distances)]
+    if workers is None:
+        workers = min(len(jobs), os.cpu_count() or 1)
+
+    if workers <= 1:
+        results = [_solve_job(job) for job in jobs]
+    else:
+        # Larger chunks keep the per-task overhead down when there are many small clusters
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_solve_job, jobs, chunksize=chunksize))
+
+    routes = []
+    parcels_delivered = []
+    for part, (route, parcels) in zip(parts, results):
+        routes.append([-1 if stop == -1 else int(part[stop]) for stop in route])
+        parcels_delivered.append(list(parcels))
+    return routes, parcels_delivered, parts
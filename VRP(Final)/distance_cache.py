@@ -0,0 +1,180 @@
+import getpass
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+from distances import CondensedDistanceMatrix, build_distance_matrix
+
+DEFAULT_MEMORY_BYTES = 512 << 20
+DEFAULT_SPILL_BYTES = 64 << 20  # Matrices at least this big live on disk as memory maps, when spilling
+DEFAULT_DISK_BYTES = 8 << 30
+
+_default_cache = None
+
+
+def user_cache_directory():
+    # Per-user spill directory in the temp dir, for DistanceCache(directory=...). Nothing
+    # removes it on exit: call clear(disk=True) or delete the directory to free the space.
+    try:
+        user = getpass.getuser()
+    except (KeyError, OSError):
+        user = str(os.getuid()) if hasattr(os, "getuid") else "user"
+    return os.path.join(tempfile.gettempdir(), f"vrp_distance_cache-{user}")
+
+
+def location_key(locations, storage, metric="euclidean"):
+    # Fingerprint of the depot + customer coordinates, the storage layout and the metric
+    locations = np.ascontiguousarray(locations, dtype=np.float64)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{storage} {metric}".encode())
+    digest.update(str(locations.shape).encode())
+    digest.update(locations.tobytes())
+    return digest.hexdigest()
+
+
+def _payload(matrix):
+    # The array that holds a matrix's values
+    return matrix.data if isinstance(matrix, CondensedDistanceMatrix) else matrix
+
+
+def _wrap(array, storage, size):
+    return CondensedDistanceMatrix(array, size) if storage == "condensed" else array
+
+
+class DistanceCache:
+    # Distance matrices keyed by location_key(). Matrices stay in memory, in an LRU
+    # limited to ``memory_bytes``. Spilling to disk is opt-in: given a ``directory`` (e.g.
+    # user_cache_directory()), matrices of ``spill_bytes`` or more are written there as
+    # .npy files and handed out as read-only memory maps, so the OS page cache holds them
+    # and later processes can reuse them too. The directory is pruned oldest-used first
+    # once it grows past ``disk_bytes`` and otherwise kept until clear(disk=True).
+    # Cached arrays are read-only since every MasterRoutingAgent with the same locations
+    # shares them.
+    def __init__(self, memory_bytes: int = DEFAULT_MEMORY_BYTES, spill_bytes: int = DEFAULT_SPILL_BYTES,
+                 disk_bytes: int = DEFAULT_DISK_BYTES, directory: str = None):
+        self.memory_bytes = memory_bytes
+        self.spill_bytes = spill_bytes
+        self.disk_bytes = disk_bytes
+        self.directory = directory
+        self._entries = OrderedDict()  # key -> (array, storage, size)
+        self._used = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _wrap(*entry)
+        if self.directory is not None:
+            storage, size = self._read_meta(key)
+            if storage is not None:
+                path = self._path(key)
+                try:
+                    array = np.load(path, mmap_mode="r")
+                    os.utime(path)  # Marks it as recently used for pruning
+                except (OSError, ValueError):
+                    pass
+                else:
+                    with self._lock:
+                        self.hits += 1
+                    return _wrap(array, storage, size)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, matrix, storage):
+        # Stores a matrix and returns the cached (read-only) version to use in its place
+        array = _payload(matrix)
+        size = len(matrix)
+        if self.directory is not None and array.nbytes >= self.spill_bytes:
+            return self._spill(key, array, storage, size)
+        array.flags.writeable = False
+        if array.nbytes > self.memory_bytes:
+            return matrix  # Larger than the whole cache, and no disk to spill to
+        with self._lock:
+            if key in self._entries:
+                self._used -= self._entries.pop(key)[0].nbytes
+            self._entries[key] = (array, storage, size)
+            self._used += array.nbytes
+            while self._used > self.memory_bytes:
+                _, (evicted, _, _) = self._entries.popitem(last=False)
+                self._used -= evicted.nbytes
+        return _wrap(array, storage, size)
+
+    def get_or_build(self, locations, storage="float64", metric="euclidean"):
+        key = location_key(locations, storage, metric)
+        matrix = self.get(key)
+        if matrix is None:
+            matrix = self.put(key, build_distance_matrix(locations, storage, metric), storage)
+        return matrix
+
+    def _spill(self, key, array, storage, size):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as f:
+            np.save(f, array)
+        with open(temporary + ".meta", "w") as f:
+            f.write(f"{storage} {size}\n")
+        # Meta first, so a reader never finds the matrix without it
+        os.replace(temporary + ".meta", path + ".meta")
+        os.replace(temporary, path)
+        self._prune()
+        return _wrap(np.load(path, mmap_mode="r"), storage, size)
+
+    def _read_meta(self, key):
+        try:
+            with open(self._path(key) + ".meta") as f:
+                storage, size = f.read().split()
+            return storage, int(size)
+        except (OSError, ValueError):
+            return None, None
+
+    def _prune(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy"):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            # Already mapped copies stay valid on POSIX; the file is gone for new readers
+            for stale in (path, path + ".meta"):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            total -= size
+
+    def clear(self, disk: bool = False):
+        with self._lock:
+            self._entries.clear()
+            self._used = 0
+        if disk and self.directory is not None and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith((".npy", ".meta")):
+                    os.remove(os.path.join(self.directory, name))
+
+
+def default_cache():
+    # Process-wide, memory-only cache used by MasterRoutingAgent unless it is given
+    # another one
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = DistanceCache()
+    return _default_cache
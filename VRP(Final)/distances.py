@@ -0,0 +1,274 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+DISTANCE_STORAGES = ("float64", "float32", "condensed", "lazy")
+METRICS = ("euclidean", "manhattan", "haversine")
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Rows per block when filling a dense matrix, sized so the temporaries stay around 32 MB
+BLOCK_ELEMENTS = 1 << 22
+
+
+def point_distances(a, b, metric="euclidean"):
+    # Distances between two broadcastable arrays of (x, y) points. For "haversine" x is
+    # the longitude and y the latitude, both in degrees, and distances are in kilometres.
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    if metric == "euclidean":
+        dx = a[..., 0] - b[..., 0]
+        dy = a[..., 1] - b[..., 1]
+        return np.sqrt(dx * dx + dy * dy)
+    if metric == "manhattan":
+        return np.abs(a[..., 0] - b[..., 0]) + np.abs(a[..., 1] - b[..., 1])
+    if metric == "haversine":
+        lon1, lat1 = np.radians(a[..., 0]), np.radians(a[..., 1])
+        lon2, lat2 = np.radians(b[..., 0]), np.radians(b[..., 1])
+        h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+    raise ValueError(f"Unknown metric '{metric}'. Use one of {', '.join(METRICS)}.")
+
+
+def cross_distances(origins, targets, dtype=np.float64, metric="euclidean"):
+    # Distances from every origin to every target, filled a block of rows at a time
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    targets = np.asarray(targets, dtype=np.float64).reshape(-1, 2)
+    matrix = np.empty((len(origins), len(targets)), dtype=dtype)
+    block_size = max(1, BLOCK_ELEMENTS // max(len(targets), 1))
+    for start in range(0, len(origins), block_size):
+        end = min(start + block_size, len(origins))
+        matrix[start:end] = point_distances(origins[start:end, None, :], targets[None, :, :], metric)
+    return matrix
+
+
+def pairwise_distances(locations, dtype=np.float64, metric="euclidean"):
+    # Dense distance matrix
+    return cross_distances(locations, locations, dtype, metric)
+
+
+def condensed_distances(locations, dtype=np.float64, metric="euclidean"):
+    # Upper triangle (i < j) of the distance matrix, row by row
+    locations = np.asarray(locations, dtype=np.float64)
+    n = len(locations)
+    data = np.empty(n * (n - 1) // 2, dtype=dtype)
+    start = 0
+    for i in range(n - 1):
+        data[start:start + n - i - 1] = point_distances(locations[i], locations[i + 1:], metric)
+        start += n - i - 1
+    return CondensedDistanceMatrix(data, n)
+
+
+def build_distance_matrix(locations, storage="float64", metric="euclidean"):
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}'. Use one of {', '.join(METRICS)}.")
+    if storage == "float64":
+        return pairwise_distances(locations, np.float64, metric)
+    if storage == "float32":
+        return pairwise_distances(locations, np.float32, metric)
+    if storage == "condensed":
+        return condensed_distances(locations, np.float64, metric)
+    if storage == "lazy":
+        return LazyDistanceMatrix(locations, metric)
+    raise ValueError(f"Unknown distance storage '{storage}'. Use one of {', '.join(DISTANCE_STORAGES)}.")
+
+
+def _as_index(size, key):
+    if isinstance(key, slice):
+        return np.arange(size)[key]
+    index = np.asarray(key)
+    return np.where(index < 0, index + size, index)
+
+
+class CondensedDistanceMatrix:
+    # Symmetric distance matrix that only keeps the upper triangle, n * (n - 1) / 2 values.
+    # Indexing mirrors a dense array for the access patterns the solver uses:
+    # m[i] gives row i, m[i, j] gives one distance and m[rows, cols] gathers many.
+    def __init__(self, data, size):
+        self.data = data
+        self.size = size
+
+    @property
+    def shape(self):
+        return (self.size, self.size)
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def __len__(self):
+        return self.size
+
+    def _flat_index(self, i, j):
+        low = np.minimum(i, j)
+        high = np.maximum(i, j)
+        return low * self.size - low * (low + 1) // 2 + high - low - 1
+
+    def row(self, i):
+        if i < 0:
+            i += self.size
+        out = np.empty(self.size, dtype=self.data.dtype)
+        out[i] = 0
+        if i:
+            out[:i] = self.data[self._flat_index(np.arange(i), i)]
+        start = self._flat_index(i, i + 1) if i + 1 < self.size else 0
+        out[i + 1:] = self.data[start:start + self.size - i - 1]
+        return out
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            if isinstance(key, (int, np.integer)):
+                return self.row(int(key))
+            return np.stack([self.row(int(i)) for i in _as_index(self.size, key)])
+
+        rows, cols = key
+        i = _as_index(self.size, rows)
+        j = _as_index(self.size, cols)
+        i, j = np.broadcast_arrays(i, j)
+        if i.ndim == 0:
+            if i == j:
+                return self.data.dtype.type(0)
+            return self.data[self._flat_index(int(i), int(j))]
+        out = np.zeros(i.shape, dtype=self.data.dtype)
+        off_diagonal = i != j
+        out[off_diagonal] = self.data[self._flat_index(i[off_diagonal], j[off_diagonal])]
+        return out
+
+    def to_dense(self):
+        return np.stack([self.row(i) for i in range(self.size)])
+
+
+class LazyDistanceMatrix:
+    # Distance "matrix" that only keeps the locations and computes entries when indexed.
+    # Memory stays O(n), which makes very large instances workable for engines that
+    # touch a few entries per step. Supports the same indexing as CondensedDistanceMatrix.
+    def __init__(self, locations, metric="euclidean"):
+        self.locations = np.asarray(locations, dtype=np.float64)
+        self.size = len(self.locations)
+        self.metric = metric
+
+    @property
+    def shape(self):
+        return (self.size, self.size)
+
+    @property
+    def dtype(self):
+        return self.locations.dtype
+
+    @property
+    def nbytes(self):
+        return self.locations.nbytes
+
+    def __len__(self):
+        return self.size
+
+    def _distances(self, i, j):
+        return point_distances(self.locations[i], self.locations[j], self.metric)
+
+    def row(self, i):
+        return self._distances(i, slice(None))
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            if isinstance(key, (int, np.integer)):
+                return self.row(int(key))
+            return np.stack([self.row(int(i)) for i in _as_index(self.size, key)])
+        rows, cols = key
+        i, j = np.broadcast_arrays(_as_index(self.size, rows), _as_index(self.size, cols))
+        return self._distances(i, j)
+
+
+class MappedDistanceMatrix:
+    # Precomputed distances, e.g. road travel times, in a square .npy file (written with
+    # np.save or numpy.lib.format.open_memmap) that may be far larger than RAM. The file
+    # is memory-mapped, so only the rows and entries the solver touches are read.
+    # ``nodes`` gives the file row of each of our matrix nodes, the depot first and then the
+    # parcels; without it node i is row i. Pickles as its path, so worker processes map
+    # the file themselves. Supports the same indexing as CondensedDistanceMatrix.
+    def __init__(self, path, nodes=None):
+        self.path = path
+        self.file = np.load(path, mmap_mode="r")
+        if self.file.ndim != 2 or self.file.shape[0] != self.file.shape[1]:
+            raise ValueError(f"{path} does not hold a square distance matrix.")
+        self.nodes = None if nodes is None else np.asarray(nodes, dtype=np.int64)
+        self.size = len(self.file) if self.nodes is None else len(self.nodes)
+
+    def __reduce__(self):
+        return MappedDistanceMatrix, (self.path, self.nodes)
+
+    @property
+    def shape(self):
+        return (self.size, self.size)
+
+    @property
+    def dtype(self):
+        return self.file.dtype
+
+    @property
+    def nbytes(self):
+        return 0 if self.nodes is None else self.nodes.nbytes
+
+    def __len__(self):
+        return self.size
+
+    def _file_rows(self, key):
+        index = _as_index(self.size, key)
+        return index if self.nodes is None else self.nodes[index]
+
+    def subset(self, nodes):
+        # Matrix over some of our nodes, in the given order, backed by the same file
+        return MappedDistanceMatrix(self.path, self._file_rows(nodes))
+
+    def row(self, i):
+        row = self.file[self._file_rows(i)]
+        return np.array(row if self.nodes is None else row[self.nodes])
+
+    def tile(self, rows, cols):
+        # Dense block of distances from the ``rows`` nodes to the ``cols`` nodes
+        return np.asarray(self.file[np.ix_(self._file_rows(rows), self._file_rows(cols))])
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            if isinstance(key, (int, np.integer)):
+                return self.row(int(key))
+            return np.stack([self.row(int(i)) for i in _as_index(self.size, key)])
+        rows, cols = key
+        i, j = np.broadcast_arrays(self._file_rows(rows), self._file_rows(cols))
+        return self.file[i, j]
+
+
+def share_matrix(distance_matrix):
+    # Copy a distance matrix into a shared memory block so worker processes can attach to
+    # it instead of each receiving a pickled copy. Returns the block, which the caller
+    # must close() and unlink() when done, and a picklable spec for attach_matrix().
+    # File-backed matrices are not copied: the block is None and workers map the file.
+    if isinstance(distance_matrix, MappedDistanceMatrix):
+        return None, ("mapped", distance_matrix)
+    metric = "euclidean"
+    if isinstance(distance_matrix, CondensedDistanceMatrix):
+        kind, array = "condensed", distance_matrix.data
+    elif isinstance(distance_matrix, LazyDistanceMatrix):
+        kind, array, metric = "lazy", distance_matrix.locations, distance_matrix.metric
+    else:
+        kind, array = "dense", np.asarray(distance_matrix)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block, (kind, block.name, array.shape, array.dtype.str, len(distance_matrix), metric)
+
+
+def attach_matrix(spec):
+    # Attach to a matrix shared by share_matrix() from a child process of the one that
+    # shared it. Keep the returned block referenced for as long as the matrix is used.
+    if spec[0] == "mapped":
+        return None, spec[1]
+    kind, name, shape, dtype, size, metric = spec
+    block = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    if kind == "condensed":
+        return block, CondensedDistanceMatrix(array, size)
+    if kind == "lazy":
+        return block, LazyDistanceMatrix(array, metric)
+    return block, array
@@ -0,0 +1,344 @@
+import numpy as np
+from spatial import GridIndex
+
+# Agents scored per batch in greedy_fleet, sized so the score matrix (512 KB) stays in
+# cache; larger blocks are memory bound and end up slower than greedy_vectorized
+FLEET_BLOCK_ELEMENTS = 1 << 16
+
+
+def _construct(distance_matrix, demand, capacities, max_distances, max_iterations, select, remove,
+               pad_stalled=True, stats=None, reporter=None):
+    # Round-robin construction shared by the array engines. It follows the same steps as
+    # MasterRoutingAgent's greedy loop; only picking the next parcel is left to ``select``,
+    # which gets (current node, distance so far, max distance, remaining capacity) and
+    # returns (parcel, distance to it) or None. ``remove`` is told when a parcel is served.
+    # With ``pad_stalled`` a stalled fleet gets the depot starts the greedy loop would keep
+    # appending until max_iterations; without it construction just stops there.
+    # ``stats`` (a SolveStats) gets the loop counters when given; ``reporter`` (a
+    # ProgressReporter) is sent the partial routes and can stop the loop early.
+    num_parcels = len(demand)
+    num_agents = len(capacities)
+    if max_iterations is None:
+        max_iterations = num_parcels * num_agents * 2
+
+    routes = [[] for _ in range(num_agents)]
+    parcels_delivered = [[] for _ in range(num_agents)]
+    agent_loads = [0 for _ in range(num_agents)]
+    agent_distances = [0 for _ in range(num_agents)]
+    num_unassigned = num_parcels
+    depot_dead_ends = set()
+
+    iteration_count = 0
+    while num_unassigned and iteration_count < max_iterations:
+        if reporter is not None:
+            if iteration_count and reporter.cancelled():
+                break  # After the first round, so every route has its depot start
+            reporter.update(iteration_count, max_iterations, num_unassigned, routes, parcels_delivered)
+        iteration_count += 1
+        all_at_depot = all(not route or route[-1] == -1 for route in routes)
+        delivered_this_round = False
+
+        for i in range(num_agents):
+            if not num_unassigned:
+                break
+
+            if not routes[i] or routes[i][-1] == -1:
+                routes[i].append(-1)  # Start from depot
+                parcels_delivered[i].append(0)
+
+            current = 0 if routes[i][-1] == -1 else routes[i][-1] + 1
+            if agent_loads[i] >= capacities[i]:
+                best = None  # Full, heads back whatever select would pick
+            elif current == 0 and (agent_distances[i], max_distances[i]) in depot_dead_ends:
+                best = None  # Same budget as a failed try from the depot and fewer parcels left
+            else:
+                best = select(current, agent_distances[i], max_distances[i], capacities[i] - agent_loads[i])
+                if best is None and current == 0:
+                    depot_dead_ends.add((agent_distances[i], max_distances[i]))
+
+            if best is None or agent_loads[i] >= capacities[i]:
+                # Return to depot
+                if routes[i][-1] != -1:
+                    routes[i].append(-1)
+                    parcels_delivered[i].append(0)
+                    agent_distances[i] += distance_matrix[current, 0]
+                    if stats is not None:
+                        stats.depot_returns += 1
+                agent_loads[i] = 0
+                continue
+
+            best_next, distance_to_next = best
+            parcels_to_deliver = int(min(capacities[i] - agent_loads[i], demand[best_next]))
+            routes[i].append(best_next)
+            parcels_delivered[i].append(parcels_to_deliver)
+            agent_loads[i] += parcels_to_deliver
+            agent_distances[i] += distance_to_next
+            delivered_this_round = True
+
+            demand[best_next] -= parcels_to_deliver
+            if demand[best_next] == 0:
+                remove(best_next)
+                num_unassigned -= 1
+
+        if all_at_depot and not delivered_this_round:
+            # Nothing can move any more: every later round only appends another depot
+            # start to each route, so add those in one go instead of looping.
+            if pad_stalled:
+                remaining_rounds = max_iterations - iteration_count
+                for i in range(num_agents):
+                    routes[i].extend([-1] * remaining_rounds)
+                    parcels_delivered[i].extend([0] * remaining_rounds)
+                if stats is not None:
+                    stats.max_iteration_hits += 1  # The padded rounds run into the limit
+            break
+
+    if stats is not None:
+        stats.outer_iterations += iteration_count
+        if num_unassigned and iteration_count >= max_iterations:
+            stats.max_iteration_hits += 1
+
+    # Ensure all routes end at the depot; agents never reached (every parcel was served
+    # before their first turn) keep an empty route
+    for i, route in enumerate(routes):
+        if route and route[-1] != -1:
+            route.append(-1)
+            parcels_delivered[i].append(0)
+            agent_distances[i] += distance_matrix[route[-2] + 1, 0]
+
+    return routes, parcels_delivered
+
+
+def _pick_best(candidates, distance_to_next, depot_distances, demand, distance_so_far, max_distance,
+               remaining_capacity, rng=None, noise=0.0):
+    # Greedy score over a batch of candidates: most parcels first, shorter leg breaks ties.
+    # With an ``rng`` each leg's distance penalty is stretched by a random factor in
+    # [1, 1 + noise), which reorders close candidates without overriding the parcel count.
+    # Returns the position of the first best feasible candidate, or None.
+    total_distance = distance_so_far + distance_to_next + depot_distances[candidates]
+    feasible = total_distance <= max_distance
+    if not feasible.any():
+        return None
+    penalty = distance_to_next / 1000
+    if rng is not None and noise:
+        penalty = penalty * (1 + noise * rng.random(len(penalty)))
+    scores = np.minimum(remaining_capacity, demand[candidates]) - penalty
+    scores[~feasible] = -np.inf
+    return int(np.argmax(scores))
+
+
+def greedy_vectorized(distance_matrix, demand, capacities, max_distances, max_iterations=None, rng=None,
+                      noise=0.0, stats=None, reporter=None, pad_stalled=True):
+    # Matrix-backed version of MasterRoutingAgent's greedy. Node 0 of the matrix is the
+    # depot and node j + 1 is parcel j. Every agent step scores all candidates at once
+    # and picks the first best one, so the result matches the scalar loop exactly.
+    # Passing an ``rng`` and ``noise`` randomizes the scores for multi-start solving.
+    # ``pad_stalled=False`` skips the trailing depot starts of a stalled fleet.
+    # ``demand`` is consumed in place.
+    num_parcels = len(demand)
+    depot_distances = np.asarray(distance_matrix[1:, 0])
+    candidates = np.arange(num_parcels)  # Unassigned parcels, kept in ascending order
+    served = np.zeros(num_parcels, dtype=bool)
+    num_served = 0
+
+    def select(current, distance_so_far, max_distance, remaining_capacity):
+        nonlocal candidates, num_served
+        # Drop fully served parcels once they make up half of the candidate array
+        if num_served and num_served * 2 >= len(candidates):
+            candidates = candidates[~served[candidates]]
+            num_served = 0
+        pool = candidates[~served[candidates]] if num_served else candidates
+        distance_to_next = np.asarray(distance_matrix[current])[pool + 1]
+        if stats is not None:
+            stats.candidate_evaluations += len(pool)
+        best = _pick_best(pool, distance_to_next, depot_distances, demand, distance_so_far, max_distance,
+                          remaining_capacity, rng, noise)
+        if best is None:
+            return None
+        return int(pool[best]), distance_to_next[best]
+
+    def remove(j):
+        nonlocal num_served
+        served[j] = True
+        num_served += 1
+
+    return _construct(distance_matrix, demand, capacities, max_distances, max_iterations, select, remove,
+                      pad_stalled, stats, reporter)
+
+
+def greedy_granular(distance_matrix, depot_location, destinations, demand, capacities, max_distances,
+                    neighbours=16, max_iterations=None, stats=None, reporter=None):
+    # Greedy that only scores the ``neighbours`` nearest unserved customers of the current
+    # stop, found through a uniform grid over ``destinations``. If none of them fit the
+    # remaining distance budget it widens the search four-fold until every unserved
+    # customer has been tried. Distances still come from ``distance_matrix``, which may be
+    # a lazy one, so each step only touches a handful of entries. A stalled fleet stops
+    # without the trailing depot starts the exact engines reproduce.
+    # ``demand`` is consumed in place.
+    destinations = np.asarray(destinations, dtype=np.float64)
+    index = GridIndex(destinations)
+    depot_distances = np.asarray(distance_matrix[1:, 0])
+    depot_location = np.asarray(depot_location, dtype=np.float64)
+
+    def select(current, distance_so_far, max_distance, remaining_capacity):
+        if current:
+            point = destinations[current - 1]
+            pool = index.neighbours(current - 1, neighbours)
+            pool = pool[index.active[pool]]
+        else:
+            point = depot_location
+            pool = index.nearest(point, neighbours)
+
+        size = neighbours
+        while True:
+            if len(pool):
+                distance_to_next = np.asarray(distance_matrix[current, pool + 1])
+                if stats is not None:
+                    stats.candidate_evaluations += len(pool)
+                best = _pick_best(pool, distance_to_next, depot_distances, demand, distance_so_far,
+                                  max_distance, remaining_capacity)
+                if best is not None:
+                    return int(pool[best]), distance_to_next[best]
+            if size >= index.num_active:
+                return None
+            size *= 4
+            pool = index.nearest(point, size)
+
+    return _construct(distance_matrix, demand, capacities, max_distances, max_iterations, select, index.remove,
+                      pad_stalled=False, stats=stats, reporter=reporter)
+
+
+def greedy_fleet(distance_matrix, demand, fleet, max_iterations=None, pad_stalled=True, stats=None, reporter=None):
+    # Round-robin greedy over a Fleet that scores a whole block of agents against every
+    # unserved parcel in one Fleet.score call, instead of one agent at a time. Agents
+    # still move in turn: each delivery rescores that parcel's column for the agents
+    # after it in the block. That can only lower scores, so an agent's precomputed best
+    # choice stands unless its column was touched, and only then is its row searched
+    # again. The routes are identical to greedy_vectorized's. Works on the fleet's load
+    # and distance arrays, which (with its routes) hold the final state afterwards.
+    # ``demand`` is consumed in place.
+    num_parcels = len(demand)
+    num_agents = len(fleet)
+    if max_iterations is None:
+        max_iterations = num_parcels * num_agents * 2
+    fleet.reset()
+    routes = fleet.routes
+    parcels_delivered = [[] for _ in range(num_agents)]
+    capacities = fleet.capacity.tolist()
+    max_distances = fleet.max_distance.tolist()
+    loads, distances = fleet.load, fleet.distance
+    served = np.zeros(num_parcels, dtype=bool)
+    num_unassigned = num_parcels
+    depot_dead_ends = set()
+    block_size = max(1, FLEET_BLOCK_ELEMENTS // max(num_parcels, 1))
+
+    iteration_count = 0
+    while num_unassigned and iteration_count < max_iterations:
+        if reporter is not None:
+            if iteration_count and reporter.cancelled():
+                break  # After the first round, so every route has its depot start
+            reporter.update(iteration_count, max_iterations, num_unassigned, routes, parcels_delivered)
+        iteration_count += 1
+        all_at_depot = all(not route or route[-1] == -1 for route in routes)
+        delivered_this_round = False
+        current = np.array([0 if not route or route[-1] == -1 else route[-1] + 1 for route in routes])
+        block_end = 0
+
+        for i in range(num_agents):
+            if not num_unassigned:
+                break
+
+            if not routes[i] or routes[i][-1] == -1:
+                routes[i].append(-1)  # Start from depot
+                parcels_delivered[i].append(0)
+
+            node = int(current[i])
+            best = None
+            if loads[i] >= capacities[i]:
+                pass  # Full, heads back
+            elif node == 0 and (float(distances[i]), max_distances[i]) in depot_dead_ends:
+                pass  # Same budget as a failed try from the depot and fewer parcels left
+            else:
+                if i >= block_end:
+                    block_start, block_end = i, min(i + block_size, num_agents)
+                    agents = np.arange(block_start, block_end)
+                    # Unserved parcels in ascending order, as greedy_vectorized keeps them.
+                    # Taken per block, as earlier blocks of the round may have served some.
+                    pool = np.flatnonzero(~served)
+                    scores, distance_to_next = fleet.score(distance_matrix, current[agents], pool, demand, agents)
+                    best_positions = scores.argmax(axis=1)
+                    best_scores = scores[np.arange(len(agents)), best_positions].tolist()
+                    best_positions = best_positions.tolist()
+                    remaining = fleet.remaining_capacity()[agents]
+                    touched = set()  # Pool positions delivered to since the block was scored
+                    if stats is not None:
+                        stats.candidate_evaluations += len(pool) * len(agents)
+                k = i - block_start
+                position = best_positions[k]
+                if position in touched and best_scores[k] > -np.inf:
+                    position = int(np.argmax(scores[k]))
+                    best_scores[k] = scores[k, position]
+                if best_scores[k] > -np.inf:
+                    best = int(pool[position]), distance_to_next[k, position]
+            if best is None and node == 0 and loads[i] < capacities[i]:
+                depot_dead_ends.add((float(distances[i]), max_distances[i]))
+
+            if best is None:
+                # Return to depot
+                if routes[i][-1] != -1:
+                    routes[i].append(-1)
+                    parcels_delivered[i].append(0)
+                    distances[i] += distance_matrix[node, 0]
+                    if stats is not None:
+                        stats.depot_returns += 1
+                loads[i] = 0
+                continue
+
+            best_next, leg = best
+            parcels_to_deliver = int(min(capacities[i] - loads[i], demand[best_next]))
+            routes[i].append(best_next)
+            parcels_delivered[i].append(parcels_to_deliver)
+            loads[i] += parcels_to_deliver
+            distances[i] += leg
+            delivered_this_round = True
+
+            demand[best_next] -= parcels_to_deliver
+            if i + 1 < block_end:
+                # Rescore the parcel for the agents after this one in the block
+                later = slice(i + 1 - block_start, None)
+                touched.add(position)
+                if demand[best_next] == 0:
+                    scores[later, position] = -np.inf
+                else:
+                    column = scores[later, position]
+                    rescored = (np.minimum(remaining[later], demand[best_next:best_next + 1])
+                                - distance_to_next[later, position] / 1000)
+                    scores[later, position] = np.where(column > -np.inf, rescored, -np.inf)
+            if demand[best_next] == 0:
+                served[best_next] = True
+                num_unassigned -= 1
+
+        if all_at_depot and not delivered_this_round:
+            # Stalled, see _construct
+            if pad_stalled:
+                remaining_rounds = max_iterations - iteration_count
+                for i in range(num_agents):
+                    routes[i].extend([-1] * remaining_rounds)
+                    parcels_delivered[i].extend([0] * remaining_rounds)
+                if stats is not None:
+                    stats.max_iteration_hits += 1
+            break
+
+    if stats is not None:
+        stats.outer_iterations += iteration_count
+        if num_unassigned and iteration_count >= max_iterations:
+            stats.max_iteration_hits += 1
+
+    # Ensure all routes end at the depot; agents never reached (every parcel was served
+    # before their first turn) keep an empty route
+    for i, route in enumerate(routes):
+        if route and route[-1] != -1:
+            route.append(-1)
+            parcels_delivered[i].append(0)
+            distances[i] += distance_matrix[route[-2] + 1, 0]
+
+    return routes, parcels_delivered
@@ -0,0 +1,88 @@
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+COUNTERS = ("outer_iterations", "candidate_evaluations", "depot_returns", "max_iteration_hits")
+
+
+class SolveStats:
+    # Diagnostics of one solve: wall time per phase, hot-path counters filled in by the
+    # construction loops, and optional cProfile / tracemalloc captures. The engines only
+    # touch it when one is passed in, so a plain solve pays nothing for it.
+    def __init__(self, profile: bool = False, trace_memory: bool = False):
+        self.phase_seconds = {}
+        self.outer_iterations = 0
+        self.candidate_evaluations = 0
+        self.depot_returns = 0
+        self.max_iteration_hits = 0
+        self.engine = None
+        self.total_distance = None
+        self.profile_enabled = profile
+        self.trace_memory_enabled = trace_memory
+        self.profile = None  # pstats.Stats of the captured phases
+        self.memory_peak = None  # Peak traced bytes
+        self.memory_top = None  # Largest allocation sites, as tracemalloc statistics
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + time.perf_counter() - start
+
+    @contextmanager
+    def capture(self):
+        # Profile and/or trace memory of the enclosed block, as enabled
+        profiler = cProfile.Profile() if self.profile_enabled else None
+        tracing = self.trace_memory_enabled and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if profiler:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+                self.profile = pstats.Stats(profiler, stream=io.StringIO())
+            if self.trace_memory_enabled and tracemalloc.is_tracing():
+                self.memory_peak = tracemalloc.get_traced_memory()[1]
+                snapshot = tracemalloc.take_snapshot().filter_traces(
+                    [tracemalloc.Filter(False, module.__file__) for module in (cProfile, tracemalloc)])
+                self.memory_top = snapshot.statistics("lineno")[:10]
+                if tracing:
+                    tracemalloc.stop()
+
+    def counters(self):
+        return {name: getattr(self, name) for name in COUNTERS}
+
+    def as_dict(self):
+        return {
+            "engine": self.engine,
+            "phase_seconds": dict(self.phase_seconds),
+            "counters": self.counters(),
+            "total_distance": self.total_distance,
+            "memory_peak": self.memory_peak,
+        }
+
+    def report(self, limit: int = 15):
+        lines = [f"Engine: {self.engine}"]
+        for name, seconds in self.phase_seconds.items():
+            lines.append(f"  {name:<22}{seconds:>10.4f}s")
+        for name, value in self.counters().items():
+            lines.append(f"  {name:<22}{value:>10}")
+        if self.total_distance is not None:
+            lines.append(f"  {'total_distance':<22}{self.total_distance:>10.2f}")
+        if self.memory_peak is not None:
+            lines.append(f"  {'memory_peak':<22}{self.memory_peak:>10} bytes")
+            lines.extend(f"    {statistic}" for statistic in self.memory_top)
+        if self.profile is not None:
+            stream = io.StringIO()
+            self.profile.stream = stream
+            self.profile.sort_stats("cumulative").print_stats(limit)
+            lines.append(stream.getvalue())
+        return "\n".join(lines)
@@ -0,0 +1,293 @@
+import time
+import numpy as np
+
+# Moves must save at least this much distance to be applied
+EPSILON = 1e-9
+
+
+def routes_to_trips(routes, parcels_delivered):
+    # Split each agent's route at the depot markers into trips of [parcel index, parcels] stops
+    plans = []
+    for route, parcels in zip(routes, parcels_delivered):
+        trips = []
+        trip = []
+        for stop, num_parcels in zip(route, parcels):
+            if stop == -1:
+                if trip:
+                    trips.append(trip)
+                    trip = []
+            else:
+                trip.append([stop, num_parcels])
+        if trip:
+            trips.append(trip)
+        plans.append(trips)
+    return plans
+
+
+def trips_to_routes(plans):
+    # Inverse of routes_to_trips: every route starts at the depot and returns after each trip
+    routes = []
+    parcels_delivered = []
+    for trips in plans:
+        route = [-1]
+        parcels = [0]
+        for trip in trips:
+            for stop, num_parcels in trip:
+                route.append(stop)
+                parcels.append(num_parcels)
+            route.append(-1)
+            parcels.append(0)
+        routes.append(route)
+        parcels_delivered.append(parcels)
+    return routes, parcels_delivered
+
+
+def trip_nodes(trip):
+    # Matrix nodes of a trip including the depot (node 0) at both ends
+    return np.array([0] + [stop + 1 for stop, _ in trip] + [0])
+
+
+def trip_distance(distance_matrix, trip):
+    nodes = trip_nodes(trip)
+    return float(np.sum(distance_matrix[nodes[:-1], nodes[1:]]))
+
+
+def improve_routes(distance_matrix, routes, parcels_delivered, capacities, max_distances,
+                   time_budget=None, max_iterations=None, cancel=None):
+    # Improve constructed routes with 2-opt and or-opt inside trips plus relocate and swap
+    # moves between trips and agents. Only moves that keep every trip within its agent's
+    # capacity and every route within its agent's max distance are applied, so the
+    # routes returned are always the best found. Stops when no move improves or when
+    # ``time_budget`` seconds or ``max_iterations`` neighbourhood scans are used up, or
+    # once ``cancel`` (anything with is_set(), e.g. a threading.Event) is set.
+    search = LocalSearch(distance_matrix, routes_to_trips(routes, parcels_delivered), capacities, max_distances,
+                         time_budget, max_iterations, cancel)
+    search.run()
+    return trips_to_routes(search.plans)
+
+
+class LocalSearch:
+    def __init__(self, distance_matrix, plans, capacities, max_distances, time_budget=None, max_iterations=None,
+                 cancel=None):
+        self.distance_matrix = distance_matrix
+        self.plans = plans
+        self.capacities = list(capacities)
+        self.max_distances = [np.inf if d is None else d for d in max_distances]
+        self.deadline = None if time_budget is None else time.perf_counter() + time_budget
+        self.max_iterations = max_iterations
+        self.iterations = 0
+        self.cancel = cancel
+        self.route_distances = [sum(trip_distance(distance_matrix, trip) for trip in trips) for trips in plans]
+
+    def _budget_left(self):
+        if self.max_iterations is not None and self.iterations >= self.max_iterations:
+            return False
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            return False
+        if self.cancel is not None and self.cancel.is_set():
+            return False
+        self.iterations += 1
+        return True
+
+    def run(self):
+        improved = True
+        while improved:
+            improved = False
+            for a, trips in enumerate(self.plans):
+                for t in range(len(trips)):
+                    while self._budget_left() and self._two_opt(a, t):
+                        improved = True
+                    while self._budget_left() and self._or_opt(a, t):
+                        improved = True
+            if self._between_trips():
+                improved = True
+            if not self._budget_left():
+                return
+
+    def _two_opt(self, a, t):
+        # Reverse the stretch of stops i..j of one trip
+        trip = self.plans[a][t]
+        if len(trip) < 2:
+            return False
+        dm = self.distance_matrix
+        seq = trip_nodes(trip)
+        forward = np.asarray(dm[seq[:-1], seq[1:]], dtype=np.float64)
+        backward = np.asarray(dm[seq[1:], seq[:-1]], dtype=np.float64)
+        # Extra cost of running legs i..j-1 backwards, for asymmetric matrices
+        reversal = np.concatenate(([0.0], np.cumsum(backward - forward)))
+
+        i = np.arange(1, len(seq) - 2)[:, None]
+        j = np.arange(2, len(seq) - 1)[None, :]
+        delta = (dm[seq[i - 1], seq[j]] + dm[seq[i], seq[j + 1]] - forward[i - 1] - forward[j]
+                 + reversal[j] - reversal[i])
+        delta = np.where(j > i, delta, np.inf)
+        best = np.unravel_index(np.argmin(delta), delta.shape)
+        if delta[best] >= -EPSILON:
+            return False
+        start, end = int(i[best[0], 0]), int(j[0, best[1]])
+        trip[start - 1:end] = trip[start - 1:end][::-1]
+        self.route_distances[a] += float(delta[best])
+        return True
+
+    def _or_opt(self, a, t):
+        # Move a run of one to three consecutive stops elsewhere in the same trip
+        trip = self.plans[a][t]
+        if len(trip) < 2:
+            return False
+        dm = self.distance_matrix
+        seq = trip_nodes(trip)
+        best_delta, best_move = -EPSILON, None
+        for length in range(1, min(3, len(trip) - 1) + 1):
+            for start in range(1, len(seq) - length):
+                end = start + length  # Segment is seq[start:end]
+                first, last = seq[start], seq[end - 1]
+                removal = dm[seq[start - 1], first] + dm[last, seq[end]] - dm[seq[start - 1], seq[end]]
+                rest = np.concatenate((seq[:start], seq[end:]))
+                insertion = dm[rest[:-1], first] + dm[last, rest[1:]] - dm[rest[:-1], rest[1:]]
+                insertion[start - 1] = np.inf  # Putting it back where it was
+                position = int(np.argmin(insertion))
+                delta = insertion[position] - removal
+                if delta < best_delta:
+                    best_delta, best_move = float(delta), (start, end, position)
+        if best_move is None:
+            return False
+        start, end, position = best_move
+        segment = trip[start - 1:end - 1]
+        rest = trip[:start - 1] + trip[end - 1:]
+        trip[:] = rest[:position] + segment + rest[position:]
+        self.route_distances[a] += best_delta
+        return True
+
+    def flatten(self):
+        # Arrays describing every stop and every leg across all trips of all agents
+        stops = []  # (agent, trip, position)
+        quantities = []
+        edges = []  # (agent, trip, position the new stop would take)
+        seqs = []
+        trip_keys = []
+        for a, trips in enumerate(self.plans):
+            for t, trip in enumerate(trips):
+                trip_id = len(trip_keys)
+                trip_keys.append((a, t))
+                seqs.append(trip_nodes(trip))
+                stops.extend((a, trip_id, p) for p in range(len(trip)))
+                quantities.extend(num_parcels for _, num_parcels in trip)
+                edges.extend((a, trip_id, p) for p in range(len(trip) + 1))
+
+        def join(parts):
+            return np.concatenate(parts) if parts else np.empty(0, dtype=int)
+
+        loads = np.array([sum(q for _, q in self.plans[a][t]) for a, t in trip_keys], dtype=np.int64)
+        return {
+            "stops": np.array(stops, dtype=int).reshape(-1, 3),
+            "edges": np.array(edges, dtype=int).reshape(-1, 3),
+            "trip_keys": trip_keys,
+            "nodes": join([seq[1:-1] for seq in seqs]),
+            "quantities": np.array(quantities, dtype=np.int64),
+            "prev": join([seq[:-2] for seq in seqs]),
+            "next": join([seq[2:] for seq in seqs]),
+            "edge_from": join([seq[:-1] for seq in seqs]),
+            "edge_to": join([seq[1:] for seq in seqs]),
+            "loads": loads,
+        }
+
+    def _between_trips(self):
+        # One pass of relocate and swap moves over every stop. Returns True if anything moved.
+        improved = False
+        flat = self.flatten()
+        u = 0
+        while u < len(flat["stops"]) and self._budget_left():
+            if self._relocate(flat, u) or self._swap(flat, u):
+                improved = True
+                flat = self.flatten()
+            u += 1
+        return improved
+
+    def _route_limits(self):
+        capacities = np.array(self.capacities, dtype=np.float64)
+        max_distances = np.array(self.max_distances, dtype=np.float64)
+        distances = np.array(self.route_distances, dtype=np.float64)
+        return capacities, max_distances, distances
+
+    def _relocate(self, flat, u):
+        # Move stop u into another trip, of this agent or another one. If that trip already
+        # visits the same customer the parcels are merged into its stop instead.
+        dm = self.distance_matrix
+        a, trip_id, position = flat["stops"][u]
+        node, quantity = flat["nodes"][u], flat["quantities"][u]
+        removal = dm[flat["prev"][u], node] + dm[node, flat["next"][u]] - dm[flat["prev"][u], flat["next"][u]]
+        capacities, max_distances, distances = self._route_limits()
+
+        edge_agents, edge_trips = flat["edges"][:, 0], flat["edges"][:, 1]
+        insertion = np.asarray(dm[flat["edge_from"], node] + dm[node, flat["edge_to"]]
+                               - dm[flat["edge_from"], flat["edge_to"]], dtype=np.float64)
+        # Merging into an existing visit of the same customer adds no distance
+        same_customer = np.flatnonzero(flat["nodes"] == node)
+        merge_trips = flat["stops"][same_customer, 1]
+        merge_agents = flat["stops"][same_customer, 0]
+
+        targets_agent = np.concatenate((edge_agents, merge_agents))
+        targets_trip = np.concatenate((edge_trips, merge_trips))
+        added = np.concatenate((insertion, np.zeros(len(same_customer))))
+        new_distance = distances[targets_agent] + added - np.where(targets_agent == a, removal, 0.0)
+        feasible = ((targets_trip != trip_id)
+                    & (flat["loads"][targets_trip] + quantity <= capacities[targets_agent])
+                    & (new_distance <= max_distances[targets_agent]))
+        delta = np.where(feasible, added - removal, np.inf)
+        best = int(np.argmin(delta))
+        if delta[best] >= -EPSILON:
+            return False
+
+        source_trip = self.plans[a][flat["trip_keys"][trip_id][1]]
+        stop = source_trip[position]
+        target_a, target_t = flat["trip_keys"][targets_trip[best]]
+        target_trip = self.plans[target_a][target_t]
+        if best < len(insertion):
+            target_trip.insert(flat["edges"][best, 2], stop)
+        else:
+            target_trip[flat["stops"][same_customer[best - len(insertion)], 2]][1] += quantity
+        source_trip.remove(stop)
+        self.route_distances[a] -= float(removal)
+        self.route_distances[target_a] += float(added[best])
+        self._drop_empty_trips(a)
+        return True
+
+    def _swap(self, flat, u):
+        # Exchange stop u with a stop v of another trip
+        dm = self.distance_matrix
+        stops, nodes, quantities = flat["stops"], flat["nodes"], flat["quantities"]
+        a, trip_id, position = stops[u]
+        node, quantity = nodes[u], quantities[u]
+        prev_u, next_u = flat["prev"][u], flat["next"][u]
+        prev_v, next_v = flat["prev"], flat["next"]
+        capacities, max_distances, distances = self._route_limits()
+
+        delta_u = np.asarray(dm[prev_u, nodes] + dm[nodes, next_u] - dm[prev_u, node] - dm[node, next_u],
+                             dtype=np.float64)
+        delta_v = np.asarray(dm[prev_v, node] + dm[node, next_v] - dm[prev_v, nodes] - dm[nodes, next_v],
+                             dtype=np.float64)
+        other_agents = stops[:, 0]
+        other_trips = stops[:, 1]
+        same_agent = other_agents == a
+        distance_u = distances[a] + delta_u + np.where(same_agent, delta_v, 0.0)
+        distance_v = distances[other_agents] + delta_v + np.where(same_agent, delta_u, 0.0)
+        feasible = ((other_trips != trip_id) & (nodes != node)
+                    & (flat["loads"][trip_id] - quantity + quantities <= capacities[a])
+                    & (flat["loads"][other_trips] - quantities + quantity <= capacities[other_agents])
+                    & (distance_u <= max_distances[a])
+                    & (distance_v <= max_distances[other_agents]))
+        delta = np.where(feasible, delta_u + delta_v, np.inf)
+        v = int(np.argmin(delta)) if len(delta) else 0
+        if not len(delta) or delta[v] >= -EPSILON:
+            return False
+
+        b, other_trip_id, other_position = stops[v]
+        trip_u = self.plans[a][flat["trip_keys"][trip_id][1]]
+        trip_v = self.plans[b][flat["trip_keys"][other_trip_id][1]]
+        trip_u[position], trip_v[other_position] = trip_v[other_position], trip_u[position]
+        self.route_distances[a] += float(delta_u[v])
+        self.route_distances[b] += float(delta_v[v])
+        return True
+
+    def _drop_empty_trips(self, a):
+        self.plans[a] = [trip for trip in self.plans[a] if trip]
@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from distances import attach_matrix, share_matrix
+from engines import greedy_vectorized
+from route_format import CompactRoutes
+
+# Set in each worker process by _attach_worker
+_worker_matrix = None
+_worker_block = None
+
+
+def total_route_distance(distance_matrix, routes):
+    # Summed length of all routes, gathered straight from the matrix (-1 is the depot)
+    return CompactRoutes.from_routes(routes).total_distance(distance_matrix)
+
+
+def _run_start(distance_matrix, demand, capacities, max_distances, seed, noise):
+    # One greedy run; seed None is the plain deterministic greedy. Stalled-fleet padding is
+    # never built and repeated depot stops (idle agents) are dropped, so a worker only
+    # sends real stops back to the parent.
+    rng = None if seed is None else np.random.default_rng(seed)
+    remaining = np.array(demand, dtype=np.int64)
+    routes, parcels_delivered = greedy_vectorized(distance_matrix, remaining, capacities, max_distances,
+                                                  rng=rng, noise=noise, pad_stalled=False)
+    compact = CompactRoutes.from_routes(routes, parcels_delivered).drop_depot_repeats()
+    routes, parcels_delivered = compact.to_routes()
+    delivered = int(compact.parcels.sum())
+    return routes, parcels_delivered, delivered, compact.total_distance(distance_matrix)
+
+
+def _attach_worker(spec):
+    global _worker_matrix, _worker_block
+    _worker_block, _worker_matrix = attach_matrix(spec)
+
+
+def _worker_start(args):
+    return _run_start(_worker_matrix, *args)
+
+
+def multistart_solve(distance_matrix, demand, capacities, max_distances, num_starts=8, seed=0, noise=0.5,
+                     workers=None):
+    # Run the plain greedy plus num_starts - 1 randomized ones and keep the solution that
+    # delivers the most parcels, then the shortest one. Worker processes attach to one
+    # shared copy of the matrix. Each start gets its own child seed of ``seed``, so the
+    # result does not depend on the number of workers or on scheduling.
+    # Returns routes, parcels_delivered and a list of (delivered, distance) per start.
+    if num_starts < 1:
+        raise ValueError("num_starts must be at least 1")
+    seeds = [None] + list(np.random.SeedSequence(seed).spawn(max(num_starts - 1, 0)))
+    jobs = [(demand, capacities, max_distances, start_seed, noise) for start_seed in seeds[:num_starts]]
+    if workers is None:
+        workers = min(len(jobs), os.cpu_count() or 1)
+
+    if workers <= 1:
+        results = [_run_start(distance_matrix, *job) for job in jobs]
+    else:
+        block, spec = share_matrix(distance_matrix)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach_worker, initargs=(spec,)) as pool:
+                results = list(pool.map(_worker_start, jobs))
+        finally:
+            if block is not None:
+                block.close()
+                block.unlink()
+
+    # Most parcels delivered first, then shortest; the earliest start wins ties
+    best = min(range(len(results)), key=lambda k: (-results[k][2], results[k][3], k))
+    routes, parcels_delivered = results[best][0], results[best][1]
+    return routes, parcels_delivered, [(delivered, distance) for _, _, delivered, distance in results]
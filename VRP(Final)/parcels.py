@@ -2,8 +2,20 @@ import sys
 import os
 import random
 import csv
+import threading
+from collections import namedtuple
+from itertools import islice
+import numpy as np
+
+# Column arrays of a parcel file plus the number of data rows that could not be parsed
+ParcelArrays = namedtuple("ParcelArrays", ["customer_ids", "x", "y", "num_parcels", "malformed"])
+
+CACHE_SUFFIX = ".cache.npz"
+LOAD_CHUNK_ROWS = 1 << 18
 
 class Package:
+    __slots__ = ("customer_id", "destination", "num_parcels")
+
     def __init__(self, customer_id, destination, num_parcels):
         self.customer_id = customer_id 
         self.destination = destination  
@@ -35,6 +47,89 @@ class Package:
         ]
         write_parcels_to_file(parcel_data, filename)
 
+class ParcelRecord:
+    # Lightweight view of one row of a ParcelTable with the same attributes as Package
+    __slots__ = ("table", "index")
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    @property
+    def customer_id(self):
+        return str(self.table.customer_ids[self.index])
+
+    @property
+    def destination(self):
+        x, y = self.table.destinations[self.index].tolist()
+        return (x, y)
+
+    @property
+    def num_parcels(self):
+        return int(self.table.num_parcels[self.index])
+
+    @num_parcels.setter
+    def num_parcels(self, value):
+        self.table.num_parcels[self.index] = value
+
+
+class ParcelTable:
+    # Struct-of-arrays parcel set: one array per field instead of one object per parcel.
+    # Indexing gives a ParcelRecord, so code written against Package lists keeps working.
+    def __init__(self, customer_ids, destinations, num_parcels, malformed=0):
+        self.customer_ids = np.asarray(customer_ids, dtype=str)
+        self.destinations = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+        self.num_parcels = np.asarray(num_parcels, dtype=np.int64)
+        self.malformed = malformed  # Rows skipped as malformed when loaded from a file
+
+    @classmethod
+    def from_packages(cls, packages):
+        return cls([p.customer_id for p in packages], [p.destination for p in packages],
+                   [p.num_parcels for p in packages])
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays.customer_ids, np.column_stack((arrays.x, arrays.y)), arrays.num_parcels, arrays.malformed)
+
+    @classmethod
+    def from_file(cls, filename, use_cache=True):
+        table = cls.from_arrays(load_parcel_arrays(filename, use_cache))
+        if not len(table):
+            raise ValueError("No valid parcels found in the file.")
+        return table
+
+    def __len__(self):
+        return len(self.num_parcels)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("parcel index out of range")
+        return ParcelRecord(self, index)
+
+    def __iter__(self):
+        return (ParcelRecord(self, i) for i in range(len(self)))
+
+    @property
+    def nbytes(self):
+        return self.customer_ids.nbytes + self.destinations.nbytes + self.num_parcels.nbytes
+
+    def take(self, indices):
+        # New table with the given rows, in that order
+        return ParcelTable(self.customer_ids[indices], self.destinations[indices], self.num_parcels[indices])
+
+    def concat(self, other):
+        # New table with the rows of ``other`` appended
+        return ParcelTable(np.concatenate((self.customer_ids, other.customer_ids)),
+                           np.concatenate((self.destinations, other.destinations)),
+                           np.concatenate((self.num_parcels, other.num_parcels)))
+
+    def to_packages(self):
+        return [Package(customer_id, (x, y), num_parcels) for customer_id, (x, y), num_parcels
+                in zip(self.customer_ids.tolist(), self.destinations.tolist(), self.num_parcels.tolist())]
+
+
 def read_file(filename):
     parcels = []
     with open(filename, "r") as file:
@@ -60,3 +155,94 @@ def write_parcels_to_file(parcels, filename):
                 f"{parcel['destination'][1]:.2f}",
                 parcel['num_parcels']
             ])
+
+
+def _parse_row(line):
+    # Same rules as MRA.load_parcels_from_file; returns None for a malformed row
+    parts = line.strip().split(',')
+    if len(parts) < 4:
+        return None
+    try:
+        return parts[0].strip(), float(parts[1].strip()), float(parts[2].strip()), int(parts[3].strip())
+    except ValueError:
+        return None
+
+
+def parcel_record_dtype(id_width):
+    # One parcel file row; also the record layout of binary (.npy) parcel files
+    return np.dtype([("customer_id", f"U{id_width}"), ("x", "f8"), ("y", "f8"), ("num_parcels", "i8")])
+
+
+def _parse_chunk(lines, id_width=32):
+    # Parse a block of lines with NumPy's C reader; on any bad row fall back to row by row
+    dtype = parcel_record_dtype(id_width)
+    try:
+        rows = np.loadtxt(lines, delimiter=",", dtype=dtype, usecols=(0, 1, 2, 3), comments=None, ndmin=1)
+        malformed = 0
+    except ValueError:
+        parsed = [_parse_row(line) for line in lines if line.strip()]
+        good = [row for row in parsed if row is not None]
+        rows = np.array(good, dtype=dtype) if good else np.empty(0, dtype=dtype)
+        malformed = len(parsed) - len(good)
+    ids = np.char.strip(rows["customer_id"])
+    if len(ids) and np.char.str_len(rows["customer_id"]).max() >= id_width:
+        return _parse_chunk(lines, id_width * 4)  # Some ids may have been cut short
+    return ids, rows["x"], rows["y"], rows["num_parcels"], malformed
+
+
+def _read_parcel_arrays(filename):
+    chunks = []
+    malformed = 0
+    with open(filename, "r") as f:
+        next(f, None)  # Skip header row
+        while True:
+            lines = list(islice(f, LOAD_CHUNK_ROWS))
+            if not lines:
+                break
+            *columns, bad = _parse_chunk(lines)
+            chunks.append(columns)
+            malformed += bad
+    if not chunks:
+        return ParcelArrays(np.empty(0, dtype="U1"), np.empty(0), np.empty(0), np.empty(0, dtype=np.int64), 0)
+    ids, x, y, num_parcels = (np.concatenate(column) for column in zip(*chunks))
+    if len(ids):
+        ids = ids.astype(f"U{max(1, int(np.char.str_len(ids).max()))}")  # Trim the parse width
+    return ParcelArrays(ids, x, y, num_parcels, malformed)
+
+
+def load_parcel_arrays(filename, use_cache=True):
+    # Bulk loader: reads a parcel file straight into NumPy arrays, counting malformed rows
+    # instead of printing them, and skipping blank lines. The result is cached next to
+    # the file as <filename>.cache.npz, tied to the file's size and modification time, so
+    # loading an unchanged file again only reads the cache. Binary .npy parcel files
+    # (parcel_record_dtype records) are read directly and need no cache.
+    if filename.endswith(".npy"):
+        records = np.load(filename, mmap_mode="r")
+        return ParcelArrays(np.asarray(records["customer_id"]), np.asarray(records["x"]), np.asarray(records["y"]),
+                            np.asarray(records["num_parcels"]), 0)
+    stat = os.stat(filename)
+    cache_path = filename + CACHE_SUFFIX
+    if use_cache and os.path.exists(cache_path):
+        try:
+            with np.load(cache_path, allow_pickle=False) as cached:
+                if int(cached["source_mtime_ns"]) == stat.st_mtime_ns and int(cached["source_size"]) == stat.st_size:
+                    return ParcelArrays(cached["customer_ids"], cached["x"], cached["y"], cached["num_parcels"],
+                                        int(cached["malformed"]))
+        except (OSError, KeyError, ValueError):
+            pass  # Unreadable cache, parse the file again
+
+    arrays = _read_parcel_arrays(filename)
+    if use_cache:
+        # Unique per process and thread: parallel loads of one file each write their own
+        temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                np.savez(f, customer_ids=arrays.customer_ids, x=arrays.x, y=arrays.y,
+                         num_parcels=arrays.num_parcels, malformed=arrays.malformed,
+                         source_mtime_ns=stat.st_mtime_ns, source_size=stat.st_size)
+            os.replace(temp_path, cache_path)
+        except OSError:
+            # Read-only location; the parsed arrays are still good
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    return arrays
@@ -0,0 +1,38 @@
+import time
+from collections import namedtuple
+
+# One progress report of a running solve. routes / parcels_delivered are copies of the
+# partial routes so far; the last report of a solve has done=True and the final routes.
+SolveProgress = namedtuple("SolveProgress", ["iteration", "max_iterations", "customers_left", "routes",
+                                             "parcels_delivered", "done", "cancelled"])
+
+
+class ProgressReporter:
+    # Link between a construction loop and whoever watches it. ``callback`` receives
+    # SolveProgress reports, at most one per ``interval`` seconds so copying the partial
+    # routes stays cheap; passing queue.Queue().put makes it safe to consume from another
+    # thread. ``cancel`` is any object with is_set(), e.g. a threading.Event: once it is
+    # set the solver stops at the next round and returns the routes built so far.
+    def __init__(self, callback=None, cancel=None, interval: float = 0.25):
+        self.callback = callback
+        self.cancel = cancel
+        self.interval = interval
+        self._next_report = time.perf_counter() + interval
+
+    def cancelled(self):
+        return self.cancel is not None and self.cancel.is_set()
+
+    def update(self, iteration, max_iterations, customers_left, routes, parcels_delivered):
+        if self.callback is None:
+            return
+        now = time.perf_counter()
+        if now < self._next_report:
+            return
+        self._next_report = now + self.interval
+        self.callback(SolveProgress(iteration, max_iterations, customers_left, [list(route) for route in routes],
+                                    [list(parcels) for parcels in parcels_delivered], False, False))
+
+    def finish(self, routes, parcels_delivered, customers_left=None):
+        if self.callback is not None:
+            self.callback(SolveProgress(None, None, customers_left, routes, parcels_delivered, True,
+                                        self.cancelled()))
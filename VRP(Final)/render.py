@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from parcels import ParcelTable
+
+# Route maps without a display: figures are drawn on matplotlib's Agg canvas directly
+# (no pyplot, no tkinter), so worker processes can render PNG or SVG maps in parallel.
+#   python render.py plans/ --output-dir maps/ --format svg
+
+ROUTE_COLORS = ['g', 'm', 'c', 'y', 'k']
+# Customer labels are only drawn while at most this many customers are in view
+LABEL_LIMIT = 150
+# Level of detail for routes: direction arrows only up to ARROW_LIMIT legs, and thin
+# non-antialiased lines beyond DETAIL_LIMIT legs, where single legs are unreadable anyway
+ARROW_LIMIT = 2000
+DETAIL_LIMIT = 5000
+LEGEND_LIMIT = 20  # Routes listed in the legend
+
+
+def route_segments(coords, route):
+    # Legs of one route as an (n, 2, 2) array plus a mask of the legs returning to the
+    # depot. coords[0] is the depot and coords[j + 1] customer j; depot-to-depot legs
+    # (repeated depot starts) are dropped as they draw nothing.
+    stops = np.asarray(route, dtype=np.int64)
+    nodes = np.concatenate(([0], np.where(stops == -1, 0, stops + 1)))
+    moving = nodes[:-1] != nodes[1:]
+    start, end = nodes[:-1][moving], nodes[1:][moving]
+    return np.stack((coords[start], coords[end]), axis=1), end == 0
+
+
+def add_route_artists(ax, coords, routes, animated=False):
+    # Adds the routes to ``ax`` and returns the artists. Up to LEGEND_LIMIT routes get a
+    # LineCollection each, for the legend; more routes are batched into two collections
+    # (legs out and dashed legs back to the depot) with per-leg colours, so the number
+    # of artists stays fixed however large the fleet. All arrows are one quiver.
+    legs = [route_segments(coords, route) for route in routes]
+    num_legs = sum(len(segments) for segments, _ in legs)
+    detailed = num_legs <= DETAIL_LIMIT
+    style = dict(linewidths=1.5 if detailed else 0.5, antialiaseds=detailed, animated=animated)
+    colors = [ROUTE_COLORS[i % len(ROUTE_COLORS)] for i in range(len(legs))]
+    artists = []
+    if num_legs and (len(legs) > LEGEND_LIMIT or num_legs <= ARROW_LIMIT):
+        all_segments = np.concatenate([segments for segments, _ in legs])
+        leg_colors = np.repeat(colors, [len(segments) for segments, _ in legs])
+    if len(legs) <= LEGEND_LIMIT:
+        for i, (segments, returns) in enumerate(legs):
+            if not len(segments):
+                continue  # Idle or stalled agent: nothing to draw, and no empty legend entry
+            lines = LineCollection(segments, colors=colors[i], linestyles=np.where(returns, '--', '-').tolist(),
+                                   label=f'Route {i+1}', **style)
+            artists.append(ax.add_collection(lines, autolim=False))
+    elif num_legs:
+        returns = np.concatenate([returns for _, returns in legs])
+        for mask, linestyle in ((~returns, '-'), (returns, '--')):
+            if mask.any():
+                lines = LineCollection(all_segments[mask], colors=leg_colors[mask].tolist(), linestyles=linestyle,
+                                       **style)
+                artists.append(ax.add_collection(lines, autolim=False))
+
+    if num_legs and num_legs <= ARROW_LIMIT:
+        origins, vectors = all_segments.mean(axis=1), (all_segments[:, 1] - all_segments[:, 0]) / 10
+        artists.append(ax.quiver(origins[:, 0], origins[:, 1], vectors[:, 0], vectors[:, 1],
+                                 color=leg_colors.tolist(), angles='xy', scale_units='xy', scale=1, width=0.004,
+                                 headwidth=4, headlength=4, headaxislength=3.5, animated=animated))
+    return artists
+
+
+def render_routes(filename, coords, routes, title="CVRP Routes", size=(8, 8), dpi=100):
+    # Draws customers, depot and routes to an image file; the format (png, svg, pdf, ...)
+    # follows the file extension
+    coords = np.asarray(coords, dtype=float)
+    fig = Figure(figsize=size, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.scatter(coords[1:, 0], coords[1:, 1], color='blue', label='Customers', s=20 if len(coords) <= 1000 else 2)
+    ax.scatter(coords[0, 0], coords[0, 1], color='red', label='Depot', s=100)
+    if len(coords) - 1 <= LABEL_LIMIT:
+        for i, point in enumerate(coords[1:]):
+            ax.annotate(f'C{i+1}', point, xytext=(5, 5), textcoords='offset points')
+    add_route_artists(ax, coords, routes)
+    ax.legend(loc='upper right')
+    ax.set_title(title)
+    fig.savefig(filename)
+    return filename
+
+
+def render_plan(plan_file, output):
+    # Route map of a plan written by cli.py; customer coordinates come from the plan's
+    # parcel file
+    with open(plan_file) as f:
+        plan = json.load(f)
+    parcels = ParcelTable.from_file(plan["parcel_file"])
+    coords = np.vstack(([plan["depot"]], parcels.destinations))
+    routes = [[stop["parcel_index"] for stop in agent["stops"]] for agent in plan["agents"]]
+    title = f"{os.path.basename(plan['parcel_file'])}: {plan['parcels_delivered']}/{plan['parcels_total']} " \
+            f"parcels, distance {plan['total_distance']:.2f}"
+    return render_routes(output, coords, routes, title)
+
+
+def _render_job(job):
+    plan_file, output = job
+    try:
+        return render_plan(plan_file, output), None
+    except (OSError, ValueError, KeyError) as e:
+        return None, f"{plan_file}: {e}"
+
+
+def render_plans(plan_files, output_dir, image_format="png", workers=None):
+    # Renders every plan to <output_dir>/<plan name>.<format> in a process pool.
+    # Returns a (output or None, error or None) pair per plan, in order.
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(plan_file, os.path.join(output_dir, os.path.splitext(os.path.basename(plan_file))[0]
+                                     + "." + image_format)) for plan_file in plan_files]
+    workers = min(len(jobs), workers or os.cpu_count() or 1)
+    if workers <= 1:
+        return [_render_job(job) for job in jobs]
+    # Many small figures: chunks keep the per-task overhead down
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_render_job, jobs, chunksize=chunksize))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render route maps of cli.py plans without a display.")
+    parser.add_argument("inputs", nargs="+", help="plan files, globs or directories of .json plans")
+    parser.add_argument("--output-dir", default="maps")
+    parser.add_argument("--format", default="png", choices=("png", "svg", "pdf"))
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+    from cli import find_parcel_files
+
+    plan_files = find_parcel_files(args.inputs, "*.json")
+    if not plan_files:
+        parser.error("no plan files found")
+
+    failures = 0
+    for _, error in render_plans(plan_files, args.output_dir, args.format, args.workers):
+        if error:
+            failures += 1
+            print(f"FAILED {error}", file=sys.stderr)
+    print(f"Rendered {len(plan_files) - failures} of {len(plan_files)} plans to {args.output_dir}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+from itertools import chain
+import numpy as np
+
+
+def _segment_sums(values, bounds):
+    # Sum of values[bounds[k]:bounds[k + 1]] for every k, 0 for empty segments
+    starts = np.asarray(bounds[:-1])
+    nonempty = starts < np.asarray(bounds[1:])
+    sums = np.zeros(len(starts), dtype=values.dtype)
+    if nonempty.any():
+        sums[nonempty] = np.add.reduceat(values, starts[nonempty])
+    return sums
+
+
+class CompactRoutes:
+    # Routes of every agent in CSR form: ``stops`` is one int32 array holding all routes
+    # back to back (parcel indices, -1 for the depot, as in the usual route lists) and
+    # agent a's route is stops[offsets[a]:offsets[a + 1]]. ``parcels`` holds the parcels
+    # delivered at each stop, or is None. Leg costs are one gather over the distance
+    # matrix and route totals one np.add.reduceat, so scoring a solution costs a few
+    # array operations rather than a Python walk over every stop.
+    def __init__(self, stops, offsets, parcels=None):
+        self.stops = np.asarray(stops, dtype=np.int32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.parcels = None if parcels is None else np.asarray(parcels, dtype=np.int32)
+
+    @classmethod
+    def from_routes(cls, routes, parcels_delivered=None):
+        offsets = np.zeros(len(routes) + 1, dtype=np.int64)
+        np.cumsum([len(route) for route in routes], out=offsets[1:])
+        count = int(offsets[-1])
+        stops = np.fromiter(chain.from_iterable(routes), dtype=np.int32, count=count)
+        parcels = None
+        if parcels_delivered is not None:
+            parcels = np.fromiter(chain.from_iterable(parcels_delivered), dtype=np.int32, count=count)
+        return cls(stops, offsets, parcels)
+
+    @classmethod
+    def concat(cls, solutions):
+        # All routes of several solutions in one CompactRoutes, solution after solution
+        stops = np.concatenate([solution.stops for solution in solutions])
+        bases = np.cumsum([0] + [len(solution.stops) for solution in solutions])
+        offsets = np.concatenate([solution.offsets[:-1] + base for solution, base in zip(solutions, bases)]
+                                 + [bases[-1:]])
+        parcels = None
+        if all(solution.parcels is not None for solution in solutions):
+            parcels = np.concatenate([solution.parcels for solution in solutions])
+        return cls(stops, offsets, parcels)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def route(self, a):
+        return self.stops[self.offsets[a]:self.offsets[a + 1]]
+
+    def to_routes(self):
+        # Back to (routes, parcels_delivered) lists; parcels_delivered is None if unknown
+        stops = self.stops.tolist()
+        bounds = self.offsets.tolist()
+        routes = [stops[start:end] for start, end in zip(bounds, bounds[1:])]
+        if self.parcels is None:
+            return routes, None
+        parcels = self.parcels.tolist()
+        return routes, [parcels[start:end] for start, end in zip(bounds, bounds[1:])]
+
+    def drop_depot_repeats(self):
+        # Same routes without depot stops that directly follow another depot stop (the
+        # padding of a stalled fleet). They are zero-length legs, so costs do not change.
+        repeat = np.zeros(len(self.stops), dtype=bool)
+        repeat[1:] = (self.stops[1:] == -1) & (self.stops[:-1] == -1)
+        repeat[self.offsets[:-1][self.offsets[:-1] < len(self.stops)]] = False  # Keep each route's start
+        keep = ~repeat
+        offsets = np.zeros_like(self.offsets)
+        np.cumsum(_segment_sums(keep.astype(np.int64), self.offsets), out=offsets[1:])
+        return CompactRoutes(self.stops[keep], offsets, None if self.parcels is None else self.parcels[keep])
+
+    def leg_costs(self, distance_matrix):
+        # Length of the leg into every stop; each route starts from the depot (node 0)
+        nodes = self.stops.astype(np.intp) + 1
+        previous = np.empty_like(nodes)
+        previous[1:] = nodes[:-1]
+        starts = self.offsets[:-1]
+        previous[starts[starts < len(nodes)]] = 0
+        if not len(nodes):
+            return np.zeros(0)
+        return np.asarray(distance_matrix[previous, nodes], dtype=np.float64)
+
+    def route_distances(self, distance_matrix, legs=None):
+        if legs is None:
+            legs = self.leg_costs(distance_matrix)
+        return _segment_sums(legs, self.offsets)
+
+    def total_distance(self, distance_matrix):
+        return float(self.leg_costs(distance_matrix).sum())
+
+    def parcels_per_route(self):
+        return _segment_sums(self.parcels.astype(np.int64), self.offsets)
+
+    def save(self, filename):
+        # Binary .npz of the arrays, written under exactly this name
+        arrays = {"stops": self.stops, "offsets": self.offsets}
+        if self.parcels is not None:
+            arrays["parcels"] = self.parcels
+        with open(filename, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename, allow_pickle=False) as saved:
+            return cls(saved["stops"], saved["offsets"], saved["parcels"] if "parcels" in saved.files else None)
+
+
+def score_solutions(distance_matrix, solutions):
+    # Total distance of each of many candidate solutions (CompactRoutes), from one gather
+    # over the matrix for all of them
+    if not solutions:
+        return np.zeros(0)
+    combined = CompactRoutes.concat(solutions)
+    bounds = np.cumsum([0] + [len(solution.stops) for solution in solutions])
+    return _segment_sums(combined.leg_costs(distance_matrix), bounds)
@@ -0,0 +1,182 @@
+import heapq
+from collections import deque
+import numpy as np
+from spatial import GridIndex
+
+# Rows of savings computed per block, so the temporaries stay around 32 MB
+SAVINGS_BLOCK_ELEMENTS = 1 << 22
+# Joins tried between progress reports / cancel checks
+SAVINGS_REPORT_EVERY = 1024
+
+
+def _savings_candidates(distance_matrix, nodes, depot_distances, neighbours, points=None):
+    # Positive savings d(0, i) + d(0, j) - d(i, j) as a heap of (-saving, i, j) positions
+    # into ``nodes``. With ``points`` (the nodes' coordinates) only each node's
+    # `neighbours` nearest nodes are paired with it, found through a grid, so the work is
+    # O(n * neighbours). Otherwise every pair is scored, a block of rows at a time, and
+    # each node keeps its best `neighbours` savings (all of them if neighbours is None).
+    count = len(nodes)
+    keep = count - 1 if neighbours is None else min(neighbours, count - 1)
+    if keep <= 0:
+        return []
+    matrix_nodes = nodes + 1
+    if points is not None and neighbours is not None:
+        index = GridIndex(points)
+        near = np.array([index.neighbours(i, keep) for i in range(count)]).reshape(count, keep)
+        i = np.broadcast_to(np.arange(count)[:, None], near.shape)
+        values = (depot_distances[i] + depot_distances[near]
+                  - np.asarray(distance_matrix[matrix_nodes[i], matrix_nodes[near]], dtype=np.float64))
+        positive = values > 0
+        heap = list(zip((-values[positive]).tolist(), i[positive].tolist(), near[positive].tolist()))
+        heapq.heapify(heap)
+        return heap
+
+    block_size = max(1, SAVINGS_BLOCK_ELEMENTS // count)
+    heap = []
+    for start in range(0, count, block_size):
+        rows = np.arange(start, min(start + block_size, count))
+        savings = (depot_distances[rows, None] + depot_distances[None, :]
+                   - np.asarray(distance_matrix[matrix_nodes[rows, None], matrix_nodes[None, :]], dtype=np.float64))
+        savings[np.arange(len(rows)), rows] = -np.inf
+        if keep < count - 1:
+            best = np.argpartition(-savings, keep - 1, axis=1)[:, :keep]
+        else:
+            best = np.broadcast_to(np.arange(count), savings.shape)
+        values = np.take_along_axis(savings, best, axis=1)
+        i = np.broadcast_to(rows[:, None], best.shape)
+        # Each pair once, from its lower end, unless only the other end keeps it
+        positive = (values > 0) & ((i < best) | (neighbours is not None))
+        heap.extend(zip((-values[positive]).tolist(), i[positive].tolist(), best[positive].tolist()))
+    heapq.heapify(heap)
+    return heap
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def savings_trips(distance_matrix, demand, trip_capacity, trip_max_distance=None, neighbours=50,
+                  destinations=None, stats=None, reporter=None):
+    # Clarke-Wright savings: start from one depot-customer-depot trip per customer and
+    # repeatedly join the two trips with the largest saving, as long as the joined trip
+    # stays within ``trip_capacity`` parcels and ``trip_max_distance``. Joined customers
+    # must both be trip ends. Trips are deques and a union-find maps every customer to
+    # its trip; the shorter trip is always moved into the longer one.
+    # Customers with more parcels than a trip holds get full-load trips of their own for
+    # the excess. Passing ``destinations`` limits the candidate joins to each customer's
+    # `neighbours` nearest customers. Returns a list of (stops, parcels, distance) trips.
+    # ``reporter`` is sent progress every SAVINGS_REPORT_EVERY joins tried (no routes yet)
+    # and, once cancelled, stops the joining with the trips merged so far.
+    demand = np.asarray(demand, dtype=np.int64)
+    limit = np.inf if trip_max_distance is None else trip_max_distance
+    depot_row = np.asarray(distance_matrix[0, 1:], dtype=np.float64)
+    back_row = np.asarray(distance_matrix[1:, 0], dtype=np.float64)
+    trips = []
+
+    full_loads, remainder = np.divmod(demand, trip_capacity)
+    for j in np.flatnonzero(full_loads).tolist():
+        length = float(depot_row[j] + back_row[j])
+        if length <= limit:
+            trips.extend([([j], [int(trip_capacity)], length)] * int(full_loads[j]))
+
+    nodes = np.flatnonzero(remainder)
+    nodes = nodes[depot_row[nodes] + back_row[nodes] <= limit]  # Unreachable on their own
+    count = len(nodes)
+    points = None if destinations is None else np.asarray(destinations, dtype=np.float64)[nodes]
+    heap = _savings_candidates(distance_matrix, nodes, depot_row[nodes], neighbours, points)
+    num_candidates = len(heap)
+    if stats is not None:
+        stats.candidate_evaluations += num_candidates
+
+    parent = list(range(count))
+    routes = [deque([k]) for k in range(count)]
+    loads = remainder[nodes].tolist()
+    lengths = (depot_row[nodes] + back_row[nodes]).tolist()
+    tried = 0
+    while heap:
+        tried += 1
+        if reporter is not None and tried % SAVINGS_REPORT_EVERY == 0:
+            if reporter.cancelled():
+                break
+            reporter.update(tried, num_candidates, count, [], [])
+        saving, i, j = heapq.heappop(heap)
+        a, b = _find(parent, i), _find(parent, j)
+        if a == b:
+            continue
+        route_a, route_b = routes[a], routes[b]
+        if i not in (route_a[0], route_a[-1]) or j not in (route_b[0], route_b[-1]):
+            continue  # Interior customer, its trip can no longer be extended there
+        load = loads[a] + loads[b]
+        length = lengths[a] + lengths[b] + saving  # saving is stored negated
+        if load > trip_capacity or length > limit:
+            continue
+
+        # Orient both trips so that i ends route_a and j starts route_b
+        if len(route_a) > 1 and route_a[0] == i:
+            route_a.reverse()
+        if len(route_b) > 1 and route_b[-1] == j:
+            route_b.reverse()
+        if len(route_a) >= len(route_b):
+            route_a.extend(route_b)
+            root, child = a, b
+        else:
+            route_b.extendleft(reversed(route_a))
+            root, child = b, a
+        parent[child] = root
+        routes[child] = None
+        loads[root] = load
+        lengths[root] = length
+    if stats is not None:
+        stats.outer_iterations += tried
+
+    for k in range(count):
+        if parent[k] == k:
+            stops = [int(nodes[position]) for position in routes[k]]
+            trips.append((stops, [int(remainder[j]) for j in stops], lengths[k]))
+    return trips
+
+
+def savings_solve(distance_matrix, demand, capacities, max_distances, neighbours=50, destinations=None,
+                  stats=None, reporter=None):
+    # Savings construction for the MRA: build trips for the largest agent capacity, then
+    # hand them to agents, best parcels-per-distance first, each to the agent whose
+    # remaining distance budget fits it most tightly. Trips no agent can fit are left out.
+    # Route distances are summed leg by leg in route order, as the engines do, so an
+    # accepted route never exceeds its max distance.
+    # ``reporter`` gets the routes after every trip handed out and can cancel either phase.
+    # Returns routes and parcels_delivered in the usual format.
+    limits = [np.inf if d is None else float(d) for d in max_distances]
+    trips = savings_trips(distance_matrix, demand, max(capacities), max(limits), neighbours, destinations, stats,
+                          reporter)
+    trips.sort(key=lambda trip: (-sum(trip[1]) / max(trip[2], 1e-12), trip[0][0]))
+
+    routes = [[-1] for _ in capacities]
+    parcels_delivered = [[0] for _ in capacities]
+    used = [0.0 for _ in capacities]
+    customers_left = sum(len(trip[0]) for trip in trips)
+    for k, (stops, parcels, length) in enumerate(trips):
+        if reporter is not None:
+            if reporter.cancelled():
+                break
+            reporter.update(k, len(trips), customers_left, routes, parcels_delivered)
+        customers_left -= len(stops)
+        load = sum(parcels)
+        nodes = np.array([0] + [j + 1 for j in stops] + [0])
+        legs = np.asarray(distance_matrix[nodes[:-1], nodes[1:]], dtype=np.float64).tolist()
+        fitting = sorted((limits[a] - used[a] - length, a) for a in range(len(capacities))
+                         if capacities[a] >= load and used[a] + length <= limits[a] + 1e-9)
+        for _, a in fitting:
+            total = used[a]
+            for leg in legs:
+                total += leg
+            if total <= limits[a]:
+                used[a] = total
+                routes[a].extend(stops + [-1])
+                parcels_delivered[a].extend(parcels + [0])
+                if stats is not None:
+                    stats.depot_returns += 1
+                break
+    return routes, parcels_delivered
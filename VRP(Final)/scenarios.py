@@ -0,0 +1,167 @@
+import argparse
+import sys
+import numpy as np
+from parcels import parcel_record_dtype
+
+# Seeded, vectorized test instance generator that writes parcel files chunk by chunk,
+# so memory stays constant however many customers are generated:
+#   python scenarios.py big.csv --customers 5000000 --distribution hotspot --seed 7
+#   python scenarios.py big.npy --customers 5000000 --demand poisson --mean-demand 2
+
+DISTRIBUTIONS = ("uniform", "clustered", "hotspot")
+DEMANDS = ("uniform", "poisson", "geometric", "constant")
+
+# Customers generated per chunk. Each chunk has its own child seed, so a seed always
+# gives the same instance.
+GENERATE_CHUNK_ROWS = 1 << 18
+
+
+class ScenarioGenerator:
+    # Customers on the [min_x, max_x] x [min_y, max_y] plane.
+    #   uniform:   spread evenly
+    #   clustered: around ``num_clusters`` random centres, Gaussian with ``spread``
+    #   hotspot:   ``hotspot_share`` of the customers in a few tight hotspots whose
+    #              sizes fall off as 1 / rank, the rest spread evenly
+    # Demand per customer:
+    #   uniform:   integers in [min_demand, max_demand], like Package.create_parcels
+    #   poisson / geometric: mean ``mean_demand``, at least 1 and clipped to max_demand
+    #   constant:  always min_demand
+    # Coordinates are rounded to the two decimals parcel files store, so the CSV and
+    # binary outputs describe the same instance.
+    def __init__(self, num_customers: int, seed: int = 0, distribution: str = "uniform", demand: str = "uniform",
+                 bounds=(0.0, 100.0, 0.0, 100.0), num_clusters: int = 20, spread: float = None,
+                 num_hotspots: int = 5, hotspot_share: float = 0.6, min_demand: int = 1, max_demand: int = 5,
+                 mean_demand: float = 2.0):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution '{distribution}'. Use one of {', '.join(DISTRIBUTIONS)}.")
+        if demand not in DEMANDS:
+            raise ValueError(f"Unknown demand '{demand}'. Use one of {', '.join(DEMANDS)}.")
+        self.num_customers = num_customers
+        self.distribution = distribution
+        self.demand = demand
+        self.bounds = tuple(float(b) for b in bounds)
+        self.min_demand = min_demand
+        self.max_demand = max_demand
+        self.mean_demand = mean_demand
+        self.hotspot_share = hotspot_share
+        min_x, max_x, min_y, max_y = self.bounds
+        size = min(max_x - min_x, max_y - min_y)
+
+        # Fixed spawn keys rather than SeedSequence.spawn(), which counts its calls, so
+        # every write of the same generator gives the same instance
+        self.seed = seed
+        layout = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(0,)))
+        self.depot = (round((min_x + max_x) / 2, 2), round((min_y + max_y) / 2, 2))
+        self.centres = np.empty((0, 2))
+        self.weights = np.empty(0)
+        if distribution == "clustered":
+            self.centres = self._uniform(layout, num_clusters)
+            self.weights = np.full(num_clusters, 1.0 / num_clusters)
+            self.spread = size / 20 if spread is None else spread
+        elif distribution == "hotspot":
+            self.centres = self._uniform(layout, num_hotspots)
+            ranks = 1.0 / np.arange(1, num_hotspots + 1)
+            self.weights = ranks / ranks.sum()
+            self.spread = size / 100 if spread is None else spread
+
+    def _uniform(self, rng, count):
+        min_x, max_x, min_y, max_y = self.bounds
+        return np.column_stack((rng.uniform(min_x, max_x, count), rng.uniform(min_y, max_y, count)))
+
+    def _points(self, rng, count):
+        if self.distribution == "uniform":
+            points = self._uniform(rng, count)
+        else:
+            centre = rng.choice(len(self.centres), size=count, p=self.weights)
+            points = self.centres[centre] + rng.normal(0.0, self.spread, (count, 2))
+            if self.distribution == "hotspot":
+                background = rng.random(count) >= self.hotspot_share
+                points[background] = self._uniform(rng, int(background.sum()))
+            min_x, max_x, min_y, max_y = self.bounds
+            np.clip(points[:, 0], min_x, max_x, out=points[:, 0])
+            np.clip(points[:, 1], min_y, max_y, out=points[:, 1])
+        return np.round(points, 2)
+
+    def _demand(self, rng, count):
+        if self.demand == "uniform":
+            return rng.integers(self.min_demand, self.max_demand + 1, count)
+        if self.demand == "constant":
+            return np.full(count, self.min_demand, dtype=np.int64)
+        if self.demand == "poisson":
+            values = 1 + rng.poisson(max(self.mean_demand - 1, 0.0), count)
+        else:
+            values = rng.geometric(1.0 / max(self.mean_demand, 1.0), count)
+        return np.minimum(values, self.max_demand)
+
+    def chunks(self):
+        # Yields (customer_ids, x, y, num_parcels) arrays of up to GENERATE_CHUNK_ROWS rows
+        num_chunks = -(-self.num_customers // GENERATE_CHUNK_ROWS)
+        id_width = len(f"C{self.num_customers}")
+        for index in range(num_chunks):
+            rng = np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(1, index)))
+            start = index * GENERATE_CHUNK_ROWS
+            count = min(GENERATE_CHUNK_ROWS, self.num_customers - start)
+            ids = np.char.add("C", np.arange(start + 1, start + count + 1).astype(f"U{id_width - 1}"))
+            points = self._points(rng, count)
+            yield ids, points[:, 0], points[:, 1], self._demand(rng, count)
+
+    def write_csv(self, filename):
+        # Same layout as write_parcels_to_file
+        with open(filename, "w", newline="") as f:
+            f.write("Customer ID,X,Y,Number of Parcels\r\n")
+            for ids, x, y, num_parcels in self.chunks():
+                f.write("".join(f"{customer_id},{px:.2f},{py:.2f},{n}\r\n" for customer_id, px, py, n
+                                in zip(ids.tolist(), x.tolist(), y.tolist(), num_parcels.tolist())))
+
+    def write_binary(self, filename):
+        # .npy of parcel_record_dtype records, written through a memory map chunk by chunk
+        records = np.lib.format.open_memmap(filename, mode="w+", dtype=parcel_record_dtype(len(f"C{self.num_customers}")),
+                                            shape=(self.num_customers,))
+        start = 0
+        for ids, x, y, num_parcels in self.chunks():
+            end = start + len(ids)
+            block = records[start:end]
+            block["customer_id"] = ids
+            block["x"] = x
+            block["y"] = y
+            block["num_parcels"] = num_parcels
+            records.flush()
+            start = end
+        del records
+
+    def write(self, filename):
+        # Binary for .npy file names, CSV otherwise
+        if filename.endswith(".npy"):
+            self.write_binary(filename)
+        else:
+            self.write_csv(filename)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a seeded parcel file (CSV, or binary .npy).")
+    parser.add_argument("output", help="file to write; a .npy name gives the binary format")
+    parser.add_argument("--customers", type=int, required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--distribution", default="uniform", choices=DISTRIBUTIONS)
+    parser.add_argument("--demand", default="uniform", choices=DEMANDS)
+    parser.add_argument("--bounds", type=float, nargs=4, default=[0.0, 100.0, 0.0, 100.0],
+                        metavar=("MIN_X", "MAX_X", "MIN_Y", "MAX_Y"))
+    parser.add_argument("--clusters", type=int, default=20)
+    parser.add_argument("--hotspots", type=int, default=5)
+    parser.add_argument("--hotspot-share", type=float, default=0.6)
+    parser.add_argument("--spread", type=float, default=None, help="cluster / hotspot standard deviation")
+    parser.add_argument("--min-demand", type=int, default=1)
+    parser.add_argument("--max-demand", type=int, default=5)
+    parser.add_argument("--mean-demand", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    generator = ScenarioGenerator(args.customers, args.seed, args.distribution, args.demand, args.bounds,
+                                  args.clusters, args.spread, args.hotspots, args.hotspot_share, args.min_demand,
+                                  args.max_demand, args.mean_demand)
+    generator.write(args.output)
+    print(f"Wrote {args.customers} customers to {args.output}; depot at {generator.depot}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
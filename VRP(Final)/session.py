@@ -0,0 +1,209 @@
+import time
+import numpy as np
+from distances import LazyDistanceMatrix, cross_distances
+from local_search import EPSILON, LocalSearch, routes_to_trips, trip_distance, trips_to_routes
+from parcels import ParcelTable
+
+
+class RoutingSession:
+    # Keeps a solved plan for a MasterRoutingAgent and updates it as orders and fleet
+    # limits change during the day. New parcels get their distance rows appended to the
+    # matrix and are inserted into the existing trips; cancelled parcels are cut out of
+    # their trips and their rows removed. Nothing is re-planned from scratch.
+    #
+    # Cancelling moves the last parcels into the freed slots (swap-remove), so the
+    # matrix update is O(n) per cancelled parcel; routes are renumbered to match.
+    def __init__(self, mra, routes=None, parcels_delivered=None, engine: str = "vectorized"):
+        if isinstance(mra.distance_matrix, np.ndarray):
+            self._buffer = mra.distance_matrix
+            if not self._buffer.flags.writeable:
+                self._buffer = self._buffer.copy()
+        elif isinstance(mra.distance_matrix, LazyDistanceMatrix):
+            self._buffer = None
+        else:
+            raise ValueError("Incremental sessions need 'float64', 'float32' or 'lazy' distance storage.")
+        if routes is None:
+            routes, parcels_delivered = mra.optimize_deliveries(engine)
+
+        self.mra = mra
+        self._size = len(mra.parcels) + 1  # Matrix nodes in use, depot included
+        self.search = LocalSearch(mra.distance_matrix, routes_to_trips(routes, parcels_delivered),
+                                  mra.fleet.capacity.tolist(), mra.fleet.max_distance.tolist())
+        self.undelivered = mra.parcels.num_parcels.copy()
+        for route, parcels in zip(routes, parcels_delivered):
+            for stop, num_parcels in zip(route, parcels):
+                if stop != -1:
+                    self.undelivered[stop] -= num_parcels
+
+    @property
+    def plans(self):
+        return self.search.plans
+
+    @property
+    def routes(self):
+        # Current (routes, parcels_delivered) in the usual optimize_deliveries format
+        return trips_to_routes(self.search.plans)
+
+    def _set_matrix(self, matrix):
+        self.mra.distance_matrix = matrix
+        self.search.distance_matrix = matrix
+
+    def _locations(self):
+        return np.vstack(([self.mra.depot_location], self.mra.parcels.destinations))
+
+    def add_parcels(self, parcels):
+        # Append parcels (ParcelTable or Package list) and route them into the current
+        # plan where capacity and max distance allow. Returns their parcel indices.
+        new = parcels if isinstance(parcels, ParcelTable) else ParcelTable.from_packages(parcels)
+        start = len(self.mra.parcels)
+        self.mra.parcels = self.mra.parcels.concat(new)
+        self.undelivered = np.concatenate((self.undelivered, new.num_parcels))
+
+        if self._buffer is None:
+            self._set_matrix(LazyDistanceMatrix(self._locations(), self.mra.metric))
+        else:
+            old_size, size = self._size, self._size + len(new)
+            if size > len(self._buffer):
+                # Bounded slack (1/8) for later additions: doubling would quadruple the matrix
+                grown = np.empty((size + max(len(new), size // 8),) * 2, dtype=self._buffer.dtype)
+                grown[:old_size, :old_size] = self._buffer[:old_size, :old_size]
+                self._buffer = grown
+            rows = cross_distances(new.destinations, self._locations(), self._buffer.dtype, self.mra.metric)
+            self._buffer[old_size:size, :size] = rows
+            self._buffer[:size, old_size:size] = rows.T
+            self._size = size
+            self._set_matrix(self._buffer[:size, :size])
+
+        indices = list(range(start, start + len(new)))
+        for j in indices:
+            self._insert(j)
+        return indices
+
+    def cancel_parcels(self, indices):
+        # Drop parcels from the plan and from the instance. The last parcels take the
+        # freed indices, and the routes are renumbered accordingly.
+        cancelled = sorted(set(int(j) for j in indices), reverse=True)
+        cancelled_set = set(cancelled)
+        for a, trips in enumerate(self.search.plans):
+            for trip in trips:
+                for position in range(len(trip) - 1, -1, -1):
+                    if trip[position][0] in cancelled_set:
+                        self._remove_stop(a, trip, position)
+            self.search.plans[a] = [trip for trip in trips if trip]
+
+        order = list(range(len(self.mra.parcels)))  # order[new index] = old index
+        for j in cancelled:
+            last = len(order) - 1
+            if j != last and self._buffer is not None:
+                size = last + 2
+                self._buffer[j + 1, :size] = self._buffer[last + 1, :size]
+                self._buffer[:size, j + 1] = self._buffer[:size, last + 1]
+            order[j] = order[last]
+            order.pop()
+
+        old_to_new = np.full(len(self.mra.parcels), -1)
+        old_to_new[order] = np.arange(len(order))
+        self.mra.parcels = self.mra.parcels.take(order)
+        self.undelivered = self.undelivered[order]
+        for trips in self.search.plans:
+            for trip in trips:
+                for stop in trip:
+                    stop[0] = int(old_to_new[stop[0]])
+
+        if self._buffer is None:
+            self._set_matrix(LazyDistanceMatrix(self._locations(), self.mra.metric))
+        else:
+            self._size = len(order) + 1
+            self._set_matrix(self._buffer[:self._size, :self._size])
+
+    def set_max_distances(self, max_distances):
+        # Change the agents' distance limits. Routes that no longer fit shed stops from
+        # their end; freed parcels (and any others waiting) are routed again.
+        self.mra.set_max_distances(max_distances)
+        self.search.max_distances = [np.inf if d is None else d for d in max_distances]
+        for a, trips in enumerate(self.search.plans):
+            while trips and self.search.route_distances[a] > self.search.max_distances[a] + EPSILON:
+                self._remove_stop(a, trips[-1], len(trips[-1]) - 1)
+                if not trips[-1]:
+                    trips.pop()
+        self.repair()
+
+    def set_capacities(self, capacities):
+        # Change the agents' capacities. Overloaded trips hand back parcels from their
+        # last stops; freed parcels (and any others waiting) are routed again.
+        if len(capacities) != len(self.mra.fleet):
+            raise ValueError("Number of capacities must match number of delivery agents")
+        self.mra.fleet.capacity[:] = capacities
+        self.search.capacities = list(capacities)
+        for a, trips in enumerate(self.search.plans):
+            for trip in trips:
+                excess = sum(q for _, q in trip) - capacities[a]
+                while excess > 0:
+                    stop, num_parcels = trip[-1]
+                    if num_parcels > excess:
+                        trip[-1][1] -= excess
+                        self.undelivered[stop] += excess
+                        break
+                    self._remove_stop(a, trip, len(trip) - 1)
+                    excess -= num_parcels
+            self.search.plans[a] = [trip for trip in trips if trip]
+        self.repair()
+
+    def repair(self):
+        # Try to route every parcel that still has undelivered demand
+        for j in np.flatnonzero(self.undelivered > 0):
+            self._insert(int(j))
+
+    def _remove_stop(self, a, trip, position):
+        dm = self.search.distance_matrix
+        before = trip_distance(dm, trip)
+        stop, num_parcels = trip.pop(position)
+        self.undelivered[stop] += num_parcels
+        self.search.route_distances[a] += trip_distance(dm, trip) - before if trip else -before
+
+    def _insert(self, j):
+        # Cheapest insertion of parcel j, repeated while it has demand left and some trip,
+        # or a new trip, can take part of it within capacity and max distance
+        dm = self.search.distance_matrix
+        node = j + 1
+        capacities = np.array(self.search.capacities, dtype=np.float64)
+        max_distances = np.array(self.search.max_distances, dtype=np.float64)
+        new_trip = np.asarray(dm[0, node] + dm[node, 0], dtype=np.float64)
+        while self.undelivered[j] > 0:
+            flat = self.search.flatten()
+            distances = np.array(self.search.route_distances, dtype=np.float64)
+            edge_agents, edge_trips = flat["edges"][:, 0], flat["edges"][:, 1]
+            # Existing trips: a new stop on any leg, or more parcels on a visit to j
+            added = np.asarray(dm[flat["edge_from"], node] + dm[node, flat["edge_to"]]
+                               - dm[flat["edge_from"], flat["edge_to"]], dtype=np.float64)
+            visits = np.flatnonzero(flat["nodes"] == node)
+            agents = np.concatenate((edge_agents, flat["stops"][visits, 0], np.arange(len(capacities))))
+            spare = np.concatenate((capacities[edge_agents] - flat["loads"][edge_trips],
+                                    capacities[flat["stops"][visits, 0]] - flat["loads"][flat["stops"][visits, 1]],
+                                    capacities))
+            added = np.concatenate((added, np.zeros(len(visits)), np.full(len(capacities), float(new_trip))))
+            feasible = (spare > 0) & (distances[agents] + added <= max_distances[agents])
+            if not feasible.any():
+                return
+            best = int(np.argmin(np.where(feasible, added, np.inf)))
+            quantity = int(min(self.undelivered[j], spare[best]))
+            a = int(agents[best])
+
+            if best < len(edge_agents):
+                _, t = flat["trip_keys"][edge_trips[best]]
+                self.search.plans[a][t].insert(int(flat["edges"][best, 2]), [j, quantity])
+            elif best < len(edge_agents) + len(visits):
+                _, trip_id, position = flat["stops"][visits[best - len(edge_agents)]]
+                _, t = flat["trip_keys"][trip_id]
+                self.search.plans[a][t][position][1] += quantity
+            else:
+                self.search.plans[a].append([[j, quantity]])
+            self.search.route_distances[a] += float(added[best])
+            self.undelivered[j] -= quantity
+
+    def improve(self, time_budget: float = None, iteration_budget: int = None):
+        # Run the local search on the current plan within the given budgets
+        self.search.deadline = None if time_budget is None else time.perf_counter() + time_budget
+        self.search.max_iterations = iteration_budget
+        self.search.iterations = 0
+        self.search.run()
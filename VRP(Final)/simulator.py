@@ -0,0 +1,170 @@
+import heapq
+import numpy as np
+from route_format import CompactRoutes, _segment_sums
+
+
+class SimulationResult:
+    # Outcome of simulate(): per-agent metric arrays (one entry per agent) and the
+    # arrival time at every stop of ``routes`` (a CompactRoutes, depot repeats dropped)
+    def __init__(self, fleet, routes, arrivals, trip_loads, events):
+        self.fleet = fleet
+        self.routes = routes
+        self.arrivals = arrivals
+        self.trip_loads = trip_loads  # Parcels loaded at each depot stop, 0 at other stops
+        self.events = events
+        self.distance = None
+        self.travel_time = None
+        self.service_time = None
+        self.wait_time = None
+        self.finish_time = None
+        self.stops = None
+        self.trips = None
+        self.parcels = None
+        self.late_parcels = None
+        self.overloaded_trips = None
+
+    def as_dict(self):
+        per_agent = ("distance", "travel_time", "service_time", "wait_time", "finish_time", "stops", "trips",
+                     "parcels", "late_parcels", "overloaded_trips")
+        makespan = float(self.finish_time.max()) if len(self.finish_time) else 0.0
+        return {
+            "events": self.events,
+            "makespan": makespan,
+            "parcels": int(self.parcels.sum()),
+            "parcels_per_time": float(self.parcels.sum() / makespan) if makespan > 0 else 0.0,
+            "late_parcels": int(self.late_parcels.sum()),
+            "overloaded_trips": int(self.overloaded_trips.sum()),
+            "agents": {name: getattr(self, name).tolist() for name in per_agent},
+        }
+
+    def status_at(self, time: float):
+        # Snapshot of every agent at a moment of the simulated day, in the shape of
+        # DeliveryAgent.get_status() plus where the agent is and what it has delivered
+        stops = self.routes.stops
+        parcels = self.routes.parcels
+        bounds = self.routes.offsets.tolist()
+        statuses = []
+        for a, agent in enumerate(self.fleet):
+            start, end = bounds[a], bounds[a + 1]
+            # Last stop reached by then, -1 if the agent has not started
+            k = start + int(np.searchsorted(self.arrivals[start:end], time, side="right")) - 1
+            if k < start:
+                load, delivered, location = 0, 0, "Not started"
+            else:
+                depots = np.flatnonzero(stops[start:k + 1] == -1)
+                trip_start = start + int(depots[-1]) if len(depots) else start
+                on_trip = int(parcels[trip_start:k + 1].sum())
+                load = 0 if k == end - 1 else int(self.trip_loads[trip_start]) - on_trip
+                delivered = int(parcels[start:k + 1].sum())
+                location = "Depot" if stops[k] == -1 else f"Parcel {int(stops[k])}"
+            statuses.append({
+                'DA ID': agent.da_id,
+                'Capacity': agent.capacity,
+                'Current Load': load,
+                'Delivered': delivered,
+                'Location': location,
+            })
+        return statuses
+
+    def report(self):
+        summary = self.as_dict()
+        lines = [f"Events: {summary['events']}, makespan {summary['makespan']:.2f}, "
+                 f"{summary['parcels']} parcels ({summary['parcels_per_time']:.2f} per time unit)"]
+        if summary["late_parcels"] or summary["overloaded_trips"]:
+            lines.append(f"  late parcels {summary['late_parcels']}, overloaded trips {summary['overloaded_trips']}")
+        for a, agent in enumerate(self.fleet):
+            lines.append(f"  {agent.da_id:<8} stops {self.stops[a]:>6} trips {self.trips[a]:>4} "
+                         f"parcels {self.parcels[a]:>6} distance {self.distance[a]:>10.2f} "
+                         f"wait {self.wait_time[a]:>8.2f} finish {self.finish_time[a]:>10.2f}")
+        return "\n".join(lines)
+
+
+def simulate(distance_matrix, routes, parcels_delivered, fleet, speed: float = 1.0, service_time: float = 0.0,
+             time_per_parcel: float = 0.0, load_time: float = 0.0, load_time_per_parcel: float = 0.0,
+             loading_bays: int = None, start_times=None, shift_end: float = None):
+    # Replays planned routes as a discrete-event simulation. Travel time is the leg's
+    # distance / ``speed`` (speed 1 when the matrix already holds travel times); a stop
+    # takes service_time + time_per_parcel * parcels; before every trip the agent loads
+    # at the depot for load_time + load_time_per_parcel * parcels, at one of
+    # ``loading_bays`` bays (unlimited if None), queueing first come first served.
+    # The event queue is a heap of (time, agent, stop position) arrivals. Everything that
+    # does not depend on the queue (leg times, service times, trip loads) is computed up
+    # front as arrays, so the loop is a heap pop, a few list lookups and a push per stop.
+    # Parcels delivered after ``shift_end`` count as late. The fleet's distance and load
+    # arrays are set to the simulated end of day. Returns a SimulationResult.
+    compact = routes if isinstance(routes, CompactRoutes) else CompactRoutes.from_routes(routes, parcels_delivered)
+    compact = compact.drop_depot_repeats()
+    stops, offsets = compact.stops, compact.offsets
+    parcels = compact.parcels if compact.parcels is not None else np.zeros(len(stops), dtype=np.int32)
+    compact.parcels = parcels
+    num_agents = len(compact)
+    if num_agents != len(fleet):
+        raise ValueError("Number of routes must match number of delivery agents")
+
+    legs = compact.leg_costs(distance_matrix)
+    leg_times = legs / speed
+    at_depot = stops == -1
+    service_times = np.where(at_depot, 0.0, service_time + time_per_parcel * parcels)
+    # Each depot stop loads the parcels of the trip that follows it
+    trip_ids = np.cumsum(at_depot) - 1
+    trip_totals = np.bincount(trip_ids[~at_depot], weights=parcels[~at_depot], minlength=int(at_depot.sum()))
+    trip_loads = np.where(at_depot, trip_totals[np.maximum(trip_ids, 0)], 0).astype(np.int64)
+    load_times = np.where(at_depot, load_time + load_time_per_parcel * trip_loads, 0.0)
+    if start_times is None:
+        start_times = [0.0] * num_agents
+    elif np.ndim(start_times) == 0:
+        start_times = [float(start_times)] * num_agents
+
+    # Plain lists are faster than NumPy scalars in the event loop
+    depot_list = at_depot.tolist()
+    leg_list = leg_times.tolist()
+    service_list = service_times.tolist()
+    load_list = load_times.tolist()
+    ends = offsets[1:].tolist()
+    arrivals = [0.0] * len(stops)
+    wait = [0.0] * num_agents
+    bays = None if loading_bays is None else [0.0] * loading_bays  # Heap of the times bays free up
+
+    queue = [(float(start_times[a]) + leg_list[k], a, k) for a, k in enumerate(offsets[:-1].tolist())
+             if k < ends[a]]
+    heapq.heapify(queue)
+    events = 0
+    pop, push = heapq.heappop, heapq.heappush
+    while queue:
+        time, a, k = pop(queue)
+        events += 1
+        arrivals[k] = time
+        if k + 1 == ends[a]:
+            continue  # Back at the depot for the day
+        if depot_list[k]:
+            start = time
+            if bays is not None:
+                start = max(time, bays[0])
+                heapq.heapreplace(bays, start + load_list[k])
+                wait[a] += start - time
+            departure = start + load_list[k]
+        else:
+            departure = time + service_list[k]
+        push(queue, (departure + leg_list[k + 1], a, k + 1))
+
+    arrivals = np.array(arrivals)
+    result = SimulationResult(fleet, compact, arrivals, trip_loads, events)
+    result.distance = _segment_sums(legs, offsets)
+    result.travel_time = _segment_sums(leg_times, offsets)
+    result.service_time = _segment_sums(service_times + load_times, offsets)
+    result.wait_time = np.array(wait)
+    nonempty = offsets[1:] > offsets[:-1]
+    result.finish_time = np.zeros(num_agents)
+    result.finish_time[nonempty] = arrivals[offsets[1:][nonempty] - 1]
+    result.stops = _segment_sums((~at_depot).astype(np.int64), offsets)
+    result.trips = _segment_sums((at_depot & (trip_loads > 0)).astype(np.int64), offsets)
+    result.parcels = _segment_sums(parcels.astype(np.int64), offsets)
+    result.late_parcels = np.zeros(num_agents, dtype=np.int64)
+    if shift_end is not None:
+        result.late_parcels = _segment_sums(np.where(arrivals > shift_end, parcels, 0).astype(np.int64), offsets)
+    capacities = np.repeat(fleet.capacity, np.diff(offsets))
+    result.overloaded_trips = _segment_sums((trip_loads > capacities).astype(np.int64), offsets)
+
+    fleet.distance[:] = result.distance
+    fleet.load[:] = 0
+    return result
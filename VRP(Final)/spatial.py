@@ -0,0 +1,120 @@
+import numpy as np
+
+
+class GridIndex:
+    # Uniform grid over customer coordinates for k-nearest queries. Points can be removed
+    # (e.g. once a customer is fully served) and are then skipped by nearest().
+    def __init__(self, points, points_per_cell: float = 4.0):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        num_points = len(self.points)
+        self.active = np.ones(num_points, dtype=bool)
+        self.num_active = num_points
+        self._neighbours = {}
+        self._square_offsets = {}
+
+        if num_points:
+            self.origin = self.points.min(axis=0)
+            span = self.points.max(axis=0) - self.origin
+        else:
+            self.origin = np.zeros(2)
+            span = np.zeros(2)
+        area = span[0] * span[1]
+        if area > 0:
+            self.cell_size = float(np.sqrt(area * points_per_cell / num_points))
+        else:
+            # All points on one line (or one spot): spread them along the longer side
+            self.cell_size = float(max(span.max() * points_per_cell / max(num_points, 1), 1e-9))
+        self.nx, self.ny = (span // self.cell_size).astype(int) + 1
+
+        cx, cy = self._cell_coords(self.points)
+        self.cell_of = cx * self.ny + cy
+        self.order = np.argsort(self.cell_of, kind="stable")
+        self.cell_start = np.searchsorted(self.cell_of[self.order], np.arange(self.nx * self.ny + 1))
+        self.cell_active = np.bincount(self.cell_of, minlength=self.nx * self.ny)
+
+    def _cell_coords(self, points):
+        cells = ((points - self.origin) // self.cell_size).astype(int)
+        cx = np.clip(cells[..., 0], 0, self.nx - 1)
+        cy = np.clip(cells[..., 1], 0, self.ny - 1)
+        return cx, cy
+
+    def remove(self, i):
+        if self.active[i]:
+            self.active[i] = False
+            self.cell_active[self.cell_of[i]] -= 1
+            self.num_active -= 1
+
+    def _square(self, cx, cy, r):
+        # Cell ids within Chebyshev distance r of (cx, cy), clipped to the grid
+        offsets = self._square_offsets.get(r)
+        if offsets is None:
+            side = np.arange(-r, r + 1)
+            offsets = self._square_offsets[r] = (np.repeat(side, len(side)), np.tile(side, len(side)))
+        xs = offsets[0] + cx
+        ys = offsets[1] + cy
+        if cx - r < 0 or cy - r < 0 or cx + r >= self.nx or cy + r >= self.ny:
+            inside = (xs >= 0) & (xs < self.nx) & (ys >= 0) & (ys < self.ny)
+            xs, ys = xs[inside], ys[inside]
+        return xs * self.ny + ys
+
+    def _members(self, cell_ids):
+        starts = self.cell_start[cell_ids]
+        lengths = self.cell_start[cell_ids + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            return np.empty(0, dtype=int)
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        return self.order[offsets + np.arange(total)]
+
+    def _closest(self, point, candidates, k):
+        delta = self.points[candidates] - point
+        distances = np.sqrt(delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1])
+        if len(candidates) > k:
+            keep = np.argpartition(distances, k - 1)[:k]
+            candidates, distances = candidates[keep], distances[keep]
+        order = np.argsort(distances, kind="stable")
+        return candidates[order], distances[order]
+
+    def nearest(self, point, k: int, active_only: bool = True):
+        # Indices of the k points closest to ``point``, nearest first
+        point = np.asarray(point, dtype=np.float64)
+        available = self.num_active if active_only else len(self.points)
+        k = min(k, available)
+        if k <= 0:
+            return np.empty(0, dtype=int)
+
+        cx = min(max(int((point[0] - self.origin[0]) // self.cell_size), 0), self.nx - 1)
+        cy = min(max(int((point[1] - self.origin[1]) // self.cell_size), 0), self.ny - 1)
+        # Start from the square expected to hold about k points and double it until the
+        # k-th closest point found lies within the searched square.
+        density = available / (self.nx * self.ny)
+        r = max(1, int(np.ceil(np.sqrt(k / density) / 2)))
+        while True:
+            if (2 * r + 1) ** 2 > 4 * available or r >= max(self.nx, self.ny):
+                # The square now covers more cells than there are points left, so a plain
+                # scan over the remaining points is cheaper.
+                candidates = np.flatnonzero(self.active) if active_only else np.arange(len(self.points))
+                return self._closest(point, candidates, k)[0]
+
+            cells = self._square(cx, cy, r)
+            if active_only:
+                cells = cells[self.cell_active[cells] > 0]
+            members = self._members(cells)
+            if active_only:
+                members = members[self.active[members]]
+            if len(members) >= k:
+                # Anything outside the square is at least r cells away
+                candidates, distances = self._closest(point, members, k)
+                if distances[-1] <= r * self.cell_size:
+                    return candidates
+            r *= 2
+
+    def neighbours(self, i, k: int):
+        # Static k-nearest list of point i (itself excluded), computed on first use.
+        # Callers filter it against ``active`` to skip removed points.
+        cached = self._neighbours.get(i)
+        if cached is None or len(cached) < min(k, len(self.points) - 1):
+            cached = self.nearest(self.points[i], k + 1, active_only=False)
+            cached = cached[cached != i][:k]
+            self._neighbours[i] = cached
+        return cached[:k]
@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import numpy as np
+from DA import Fleet
+from distances import DISTANCE_STORAGES, METRICS, attach_matrix, share_matrix
+from engines import greedy_fleet, greedy_granular, greedy_vectorized
+from route_format import CompactRoutes
+from savings import savings_solve
+
+# Fleet-sizing study on one instance: every combination of agent count, capacity and
+# max distance is solved against the same distance matrix, in parallel.
+#   python sweep.py parcel_info.txt --depot 50 50 --agents 4 8 12 --capacity 10 20 --max-distance 200 400
+
+SWEEP_ENGINES = ("vectorized", "fleet", "granular", "savings")
+COLUMNS = ("num_agents", "capacity", "max_distance", "delivered", "undelivered", "total_distance",
+           "agents_used", "seconds", "error")
+
+# Set in each worker process by _attach_worker
+_worker_block = None
+_worker_instance = None
+
+
+def parameter_grid(num_agents, capacities, max_distances):
+    # Every (num_agents, capacity, max_distance) combination; each axis may be a single value
+    axes = [list(axis) if np.ndim(axis) else [axis] for axis in (num_agents, capacities, max_distances)]
+    return list(product(*axes))
+
+
+def _run_setting(instance, setting):
+    # Solve the instance with a uniform fleet of the given size and limits. The engine
+    # works on a private copy of the demand and no stalled-fleet padding is built.
+    distance_matrix, demand, engine, neighbours, depot_location, destinations = instance
+    num_agents, capacity, max_distance = setting
+    capacities = [int(capacity)] * int(num_agents)
+    max_distances = [np.inf if max_distance is None else float(max_distance)] * int(num_agents)
+    remaining = np.array(demand, dtype=np.int64)
+    start = time.perf_counter()
+    if engine == "fleet":
+        routes, parcels_delivered = greedy_fleet(distance_matrix, remaining, Fleet(capacities, max_distances),
+                                                 pad_stalled=False)
+    elif engine == "granular":
+        routes, parcels_delivered = greedy_granular(distance_matrix, depot_location, destinations, remaining,
+                                                    capacities, max_distances, neighbours)
+    elif engine == "savings":
+        routes, parcels_delivered = savings_solve(distance_matrix, remaining, capacities, max_distances, neighbours,
+                                                  destinations)
+    else:
+        routes, parcels_delivered = greedy_vectorized(distance_matrix, remaining, capacities, max_distances,
+                                                      pad_stalled=False)
+    seconds = time.perf_counter() - start
+
+    compact = CompactRoutes.from_routes(routes, parcels_delivered)
+    per_agent = compact.parcels_per_route()
+    delivered = int(per_agent.sum())
+    return {
+        "num_agents": int(num_agents),
+        "capacity": int(capacity),
+        "max_distance": max_distance,
+        "delivered": delivered,
+        "undelivered": int(np.sum(demand)) - delivered,
+        "total_distance": compact.total_distance(distance_matrix),
+        "agents_used": int(np.count_nonzero(per_agent)),
+        "seconds": seconds,
+        "error": None,
+    }
+
+
+def _safe_setting(instance, setting):
+    # A failing setting becomes a row with its error, so the rest of the sweep carries on
+    try:
+        return _run_setting(instance, setting)
+    except Exception as e:
+        num_agents, capacity, max_distance = setting
+        row = dict.fromkeys(COLUMNS)
+        row.update(num_agents=int(num_agents), capacity=int(capacity), max_distance=max_distance,
+                   error=f"{type(e).__name__}: {e}")
+        return row
+
+
+def _attach_worker(spec, instance):
+    global _worker_block, _worker_instance
+    _worker_block, distance_matrix = attach_matrix(spec)
+    _worker_instance = (distance_matrix,) + instance
+
+
+def _worker_setting(setting):
+    return _safe_setting(_worker_instance, setting)
+
+
+def sweep_fleet(distance_matrix, demand, num_agents, capacities, max_distances, engine="vectorized",
+                neighbours=16, workers=None, depot_location=None, destinations=None):
+    # Evaluate every fleet setting of parameter_grid() on one instance and return a row
+    # dict per setting, in grid order (see COLUMNS). A max distance of None means no
+    # limit. A setting that fails gets its message in "error" and None for the results.
+    # Worker processes attach to one shared copy of the matrix, as in multistart, so the
+    # matrix is built once however many settings there are. The granular and savings
+    # engines also need the coordinates: depot_location and destinations.
+    if engine not in SWEEP_ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Use one of {', '.join(SWEEP_ENGINES)}.")
+    if engine in ("granular", "savings") and destinations is None:
+        raise ValueError(f"The {engine} engine needs the depot location and destinations.")
+    if engine == "granular" and depot_location is None:
+        raise ValueError("The granular engine needs the depot location.")
+    settings = parameter_grid(num_agents, capacities, max_distances)
+    demand = np.asarray(demand)
+    instance = (demand, engine, neighbours, depot_location,
+                None if destinations is None else np.asarray(destinations, dtype=np.float64))
+    if workers is None:
+        workers = min(len(settings), os.cpu_count() or 1)
+
+    if workers <= 1:
+        return [_safe_setting((distance_matrix,) + instance, setting) for setting in settings]
+    block, spec = share_matrix(distance_matrix)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_worker, initargs=(spec, instance)) as pool:
+            return list(pool.map(_worker_setting, settings))
+    finally:
+        if block is not None:
+            block.close()
+            block.unlink()
+
+
+def format_table(rows):
+    lines = [f"{'agents':>7} {'capacity':>9} {'max dist':>10} {'delivered':>10} {'undelivered':>12} "
+             f"{'distance':>12} {'used':>5} {'seconds':>8}"]
+    for row in rows:
+        max_distance = "-" if row["max_distance"] is None else f"{row['max_distance']:.1f}"
+        if row["error"]:
+            lines.append(f"{row['num_agents']:>7} {row['capacity']:>9} {max_distance:>10} FAILED {row['error']}")
+            continue
+        lines.append(f"{row['num_agents']:>7} {row['capacity']:>9} {max_distance:>10} {row['delivered']:>10} "
+                     f"{row['undelivered']:>12} {row['total_distance']:>12.2f} {row['agents_used']:>5} "
+                     f"{row['seconds']:>8.3f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    from MRA import MasterRoutingAgent
+
+    parser = argparse.ArgumentParser(description="Solve one parcel file for a grid of fleet settings.")
+    parser.add_argument("parcel_file")
+    parser.add_argument("--depot", type=float, nargs=2, default=[50.0, 50.0], metavar=("X", "Y"))
+    parser.add_argument("--agents", type=int, nargs="+", required=True)
+    parser.add_argument("--capacity", type=int, nargs="+", required=True)
+    parser.add_argument("--max-distance", type=float, nargs="+", required=True)
+    parser.add_argument("--engine", default="vectorized", choices=SWEEP_ENGINES)
+    parser.add_argument("--neighbours", type=int, default=16)
+    parser.add_argument("--storage", default="float64", choices=DISTANCE_STORAGES)
+    parser.add_argument("--metric", default="euclidean", choices=METRICS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--json", help="also write the rows to this JSON file")
+    args = parser.parse_args(argv)
+
+    mra = MasterRoutingAgent(tuple(args.depot), args.agents[0], args.capacity[0], args.storage, args.metric,
+                             auto_adjust_capacity=False)
+    mra.load_parcels(args.parcel_file)
+    rows = mra.sweep(args.agents, args.capacity, args.max_distance, args.engine, args.neighbours, args.workers)
+    print(format_table(rows))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+import json
+import pytest
+import cli
+
+PARCELS = "Customer ID,X,Y,Number of Parcels\nC1,70,85,1\nC2,73,62,4\nC3,10,10,2\n"
+
+
+def write_parcels(directory, *names):
+    for name in names:
+        path = directory / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(PARCELS)
+
+
+def plan_depot(output_dir, stem):
+    with open(output_dir / (stem + ".json")) as f:
+        return json.load(f)["depot"]
+
+
+def test_depot_per_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_parcels(tmp_path, "a.txt", "sub/b.txt", "c.txt")
+    (tmp_path / "depots.csv").write_text("File,X,Y\na.txt,50,50\nsub/b.txt,10,90\n")
+    assert cli.main(["a.txt", "sub", "c.txt", "--depot-file", "depots.csv", "--depot", "1", "2",
+                     "--workers", "1", "--no-cache"]) == 0
+    assert plan_depot(tmp_path / "plans", "a") == [50.0, 50.0]
+    assert plan_depot(tmp_path / "plans", "b") == [10.0, 90.0]
+    assert plan_depot(tmp_path / "plans", "c") == [1.0, 2.0]
+
+
+def test_file_without_a_depot_is_an_error(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_parcels(tmp_path, "a.txt", "b.txt")
+    (tmp_path / "depots.csv").write_text("a.txt,50,50\n")
+    with pytest.raises(SystemExit):
+        cli.main(["a.txt", "b.txt", "--depot-file", "depots.csv", "--workers", "1"])
+    with pytest.raises(SystemExit):
+        cli.main(["a.txt", "--workers", "1"])
+    assert not (tmp_path / "plans").exists()
+
+
+def test_malformed_depot_file(tmp_path):
+    (tmp_path / "depots.csv").write_text("File,X,Y\na.txt,50\n")
+    with pytest.raises(ValueError, match="row 2"):
+        cli.load_depots(str(tmp_path / "depots.csv"))
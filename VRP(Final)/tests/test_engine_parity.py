@@ -0,0 +1,34 @@
+import random
+import pytest
+from CartesianPlane import generate_random_points
+from MRA import MasterRoutingAgent
+from parcels import Package
+
+# The exact engines must reproduce the scalar greedy loop stop for stop, on every
+# distance storage that holds float64 values
+EXACT_ENGINES = ("vectorized", "fleet")
+STORAGES = ("float64", "condensed", "lazy")
+
+
+def solve(seed, num_customers, num_agents, capacity, storage, engine):
+    random.seed(seed)
+    points = generate_random_points(num_customers, 0, 100, 0, 100)
+    depot = generate_random_points(1, 0, 100, 0, 100)[0]
+    parcels = Package.create_parcels(num_customers, points)
+    max_distances = [random.uniform(100, 400) for _ in range(num_agents)]
+    mra = MasterRoutingAgent(depot, num_agents, capacity, storage)
+    mra.distance_cache = None
+    mra.set_parcels(parcels)
+    mra.set_max_distances(max_distances)
+    return mra.optimize_deliveries(engine)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+@pytest.mark.parametrize("seed", range(12))
+def test_exact_engines_match_greedy(seed, storage):
+    num_customers = 10 + seed * 7
+    num_agents = 1 + seed % 5
+    capacity = 5 + seed * 3
+    expected = solve(seed, num_customers, num_agents, capacity, storage, "greedy")
+    for engine in EXACT_ENGINES:
+        assert solve(seed, num_customers, num_agents, capacity, storage, engine) == expected, engine
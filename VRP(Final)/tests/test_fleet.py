@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+import engines
+from DA import Fleet
+from distances import build_distance_matrix
+
+
+def random_instance(seed, num_parcels, num_agents):
+    rng = np.random.default_rng(seed)
+    locations = rng.uniform(0, 100, (num_parcels + 1, 2))
+    demand = rng.integers(1, 6, num_parcels)
+    capacities = rng.integers(3, 30, num_agents).tolist()
+    max_distances = rng.uniform(50, 400, num_agents).tolist()
+    return build_distance_matrix(locations), demand, capacities, max_distances
+
+
+def solve_both(distance_matrix, demand, capacities, max_distances):
+    expected = engines.greedy_vectorized(distance_matrix, demand.copy(), capacities, max_distances)
+    actual = engines.greedy_fleet(distance_matrix, demand.copy(), Fleet(capacities, max_distances))
+    return expected, actual
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_fleet_matches_vectorized_across_blocks(monkeypatch, seed):
+    # Tiny blocks, so every round spans several of them and parcels served by an earlier
+    # block must not be offered again to a later one
+    monkeypatch.setattr(engines, "FLEET_BLOCK_ELEMENTS", 64)
+    instance = random_instance(seed, 5 + seed % 40, 1 + seed % 13)
+    expected, actual = solve_both(*instance)
+    assert actual == expected
+
+
+def test_fleet_matches_vectorized_with_default_blocks():
+    distance_matrix, demand, _, _ = random_instance(0, 600, 300)
+    capacities, max_distances = [10] * 300, [300.0] * 300
+    assert 600 * 300 > engines.FLEET_BLOCK_ELEMENTS  # Several blocks per round
+    expected, actual = solve_both(distance_matrix, demand, capacities, max_distances)
+    assert actual == expected
+    routes, parcels_delivered = actual
+    # No stop at an already served customer
+    assert all(n > 0 for route, parcels in zip(routes, parcels_delivered)
+               for stop, n in zip(route, parcels) if stop != -1)
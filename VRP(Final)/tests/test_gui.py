@@ -0,0 +1,26 @@
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import pytest
+from GUI import CVRPGUI
+
+
+def headless_gui(points, depot):
+    # Just the plotting state of CVRPGUI, on an Agg canvas instead of a Tk window
+    gui = CVRPGUI.__new__(CVRPGUI)
+    gui.points, gui.depot = points, depot
+    gui.coords, gui.background, gui.plotted_agents = None, None, None
+    gui.route_artists, gui.label_artists = [], []
+    gui.fig = Figure()
+    gui.canvas = FigureCanvasAgg(gui.fig)
+    gui.ax = gui.fig.add_subplot()
+    return gui
+
+
+@pytest.mark.parametrize("idle_route", [[], [-1], [-1, -1, -1, -1]])
+def test_plot_routes_with_an_idle_agent(idle_route):
+    gui = headless_gui([(10, 10), (20, 30), (40, 5)], (0, 0))
+    gui.plot_routes([[0, 1, -1, 2, -1], idle_route])
+    labels = [text.get_text() for text in gui.ax.get_legend().get_texts()]
+    assert labels == ["Customers", "Depot", "Route 1"]
@@ -0,0 +1,70 @@
+import glob
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from parcels import CACHE_SUFFIX, ParcelTable, load_parcel_arrays
+
+PARCELS = "Customer ID,X,Y,Number of Parcels\nC1,70.5,85,1\nC2,oops,62,4\nC3,10,10,2\nC4,1,2\n"
+
+
+def write(path, text, mtime_ns=None):
+    path.write_text(text)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+def test_malformed_rows_are_counted_and_cached(tmp_path):
+    filename = write(tmp_path / "parcels.txt", PARCELS)
+    table = ParcelTable.from_file(filename)
+    assert table.customer_ids.tolist() == ["C1", "C3"]
+    assert table.malformed == 2
+    assert os.path.exists(filename + CACHE_SUFFIX)
+    assert ParcelTable.from_file(filename).malformed == 2
+
+
+def test_cache_without_malformed_count_is_rebuilt(tmp_path):
+    # A cache written before the malformed count was stored must not report 0
+    filename = write(tmp_path / "parcels.txt", PARCELS)
+    stat = os.stat(filename)
+    np.savez(filename + CACHE_SUFFIX, customer_ids=np.array(["C1", "C3"]), x=np.array([70.5, 10.0]),
+             y=np.array([85.0, 10.0]), num_parcels=np.array([1, 2]), source_mtime_ns=stat.st_mtime_ns,
+             source_size=stat.st_size)
+    assert load_parcel_arrays(filename).malformed == 2
+    with np.load(filename + CACHE_SUFFIX) as cached:
+        assert int(cached["malformed"]) == 2
+
+
+def test_stale_cache_is_ignored(tmp_path):
+    path = tmp_path / "parcels.txt"
+    filename = write(path, PARCELS, mtime_ns=1_000_000_000)
+    assert load_parcel_arrays(filename).x.tolist() == [70.5, 10.0]
+    # Same size, new contents and modification time
+    write(path, PARCELS.replace("70.5", "20.5"), mtime_ns=2_000_000_000)
+    assert load_parcel_arrays(filename).x.tolist() == [20.5, 10.0]
+    assert load_parcel_arrays(filename, use_cache=False).x.tolist() == [20.5, 10.0]
+
+
+def test_parallel_loads_write_separate_temp_files(tmp_path, monkeypatch):
+    # Every writer is held at os.replace until all have written, so a shared temp file
+    # would be overwritten or already moved away by then
+    filename = write(tmp_path / "parcels.txt", PARCELS)
+    workers = 4
+    barrier = threading.Barrier(workers, timeout=10)
+    replaced = []
+    real_replace = os.replace
+
+    def replace(source, destination):
+        barrier.wait()
+        replaced.append(source)
+        real_replace(source, destination)
+
+    monkeypatch.setattr(os, "replace", replace)
+    with ThreadPoolExecutor(workers) as pool:
+        results = list(pool.map(lambda _: load_parcel_arrays(filename), range(workers)))
+    assert all(arrays.customer_ids.tolist() == ["C1", "C3"] for arrays in results)
+    assert len(set(replaced)) == workers
+    assert not glob.glob(str(tmp_path / "*.tmp"))
+    monkeypatch.undo()
+    assert load_parcel_arrays(filename).malformed == 2
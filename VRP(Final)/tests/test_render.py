@@ -0,0 +1,11 @@
+import numpy as np
+import pytest
+from render import render_routes
+
+
+@pytest.mark.parametrize("idle_route", [[], [-1], [-1, -1, -1, -1]])
+def test_render_routes_with_an_idle_agent(tmp_path, idle_route):
+    coords = np.array([[0, 0], [10, 10], [20, 30], [40, 5]], dtype=float)
+    output = render_routes(str(tmp_path / "routes.png"), coords, [[0, 1, -1, 2, -1], idle_route])
+    with open(output, "rb") as f:
+        assert f.read(8) == b"\x89PNG\r\n\x1a\n"
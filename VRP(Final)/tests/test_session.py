@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from MRA import MasterRoutingAgent
+from parcels import ParcelTable
+
+STORAGES = ("float64", "lazy")
+NUM_AGENTS = 4
+
+
+def random_parcels(rng, count):
+    return ParcelTable([f"N{i}" for i in range(count)], rng.uniform(0, 100, (count, 2)), rng.integers(1, 4, count))
+
+
+def new_mra(parcels, storage, capacity=15):
+    mra = MasterRoutingAgent((50.0, 50.0), NUM_AGENTS, capacity, storage, auto_adjust_capacity=False)
+    mra.distance_cache = None
+    mra.set_parcels(parcels)
+    return mra
+
+
+def start(seed, storage, num_parcels=40):
+    rng = np.random.default_rng(seed)
+    mra = new_mra(random_parcels(rng, num_parcels), storage)
+    mra.set_max_distances([600.0] * NUM_AGENTS)
+    return rng, mra.start_session()
+
+
+def check_against_scratch(session):
+    # The session's matrix must be the one built from scratch for its parcels, and its
+    # plan must cost, load and deliver exactly what that matrix and instance say
+    mra = session.mra
+    scratch = new_mra(mra.parcels, "float64")
+    rows = np.arange(len(mra.distance_matrix))  # Full rows, for the lazy matrix as well
+    np.testing.assert_allclose(mra.distance_matrix[rows], scratch.distance_matrix)
+
+    routes, parcels_delivered = session.routes
+    capacities, max_distances = mra.fleet.capacity.tolist(), session.search.max_distances
+    delivered = np.zeros(len(mra.parcels), dtype=np.int64)
+    for a, (route, parcels) in enumerate(zip(routes, parcels_delivered)):
+        nodes = [0] + [stop + 1 for stop in route] + [0]  # The depot sentinel -1 becomes node 0
+        distance = sum(scratch.distance_matrix[i, j] for i, j in zip(nodes[:-1], nodes[1:]))
+        assert distance == pytest.approx(session.search.route_distances[a])
+        assert distance <= max_distances[a] + 1e-6
+        load = 0
+        for stop, num_parcels in zip(route, parcels):
+            if stop == -1:
+                load = 0
+                continue
+            load += num_parcels
+            delivered[stop] += num_parcels
+            assert load <= capacities[a]
+    np.testing.assert_array_equal(delivered + session.undelivered, mra.parcels.num_parcels)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+@pytest.mark.parametrize("seed", range(4))
+def test_add_parcels(seed, storage):
+    rng, session = start(seed, storage)
+    for count in (1, 7, 30):
+        indices = session.add_parcels(random_parcels(rng, count))
+        assert indices == list(range(len(session.mra.parcels) - count, len(session.mra.parcels)))
+        check_against_scratch(session)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+@pytest.mark.parametrize("seed", range(4))
+def test_cancel_parcels(seed, storage):
+    rng, session = start(seed, storage)
+    session.add_parcels(random_parcels(rng, 5))
+    for count in (1, 6):
+        session.cancel_parcels(rng.choice(len(session.mra.parcels), count, replace=False))
+        check_against_scratch(session)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+@pytest.mark.parametrize("seed", range(4))
+def test_set_max_distances(seed, storage):
+    _, session = start(seed, storage)
+    for limit in (150.0, 400.0, 1000.0):
+        session.set_max_distances([limit, limit / 2, limit, limit / 3])
+        check_against_scratch(session)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+@pytest.mark.parametrize("seed", range(4))
+def test_set_capacities(seed, storage):
+    _, session = start(seed, storage)
+    for capacities in ([5, 8, 3, 10], [20, 20, 20, 20]):
+        session.set_capacities(capacities)
+        check_against_scratch(session)
+
+
+def test_add_parcels_grows_the_matrix_with_bounded_slack():
+    rng, session = start(0, "float64", num_parcels=400)
+    session.add_parcels(random_parcels(rng, 1))
+    size = len(session.mra.parcels) + 1
+    assert len(session._buffer) <= size + size // 8 + 1